@@ -5,6 +5,7 @@ Fetches cryptocurrency balances from blockchain addresses using various APIs
 
 import requests
 import json
+import threading
 import time
 from typing import Dict, Optional, List
 from decimal import Decimal
@@ -26,6 +27,10 @@ try:
 except ImportError:
     PYCOIN_AVAILABLE = False
 
+# Etherscan's free tier allows 3 calls per second per API key; balance and
+# token lookups running in parallel are spaced to stay under it
+ETHERSCAN_CALLS_PER_SECOND = 3
+
 
 class BlockchainBalanceFetcher:
     """Fetches balances from various blockchain networks"""
@@ -40,6 +45,18 @@ class BlockchainBalanceFetcher:
         """
         self.etherscan_api_key = etherscan_api_key
         self.etherscan_base_url = "https://api.etherscan.io/api"
+        # Earliest time.monotonic() at which the next Etherscan call may start
+        self._etherscan_lock = threading.Lock()
+        self._etherscan_next_call = 0.0
+    
+    def _wait_for_etherscan_slot(self):
+        """Block until an Etherscan call fits within ETHERSCAN_CALLS_PER_SECOND (thread-safe)"""
+        with self._etherscan_lock:
+            now = time.monotonic()
+            start = max(now, self._etherscan_next_call)
+            self._etherscan_next_call = start + 1.0 / ETHERSCAN_CALLS_PER_SECOND
+        if start > now:
+            time.sleep(start - now)
         
     def derive_bitcoin_addresses_from_xpub(self, xpub: str, num_addresses: int = 50) -> List[str]:
         """
@@ -475,6 +492,7 @@ class BlockchainBalanceFetcher:
             
             for attempt in range(retry_count):
                 try:
+                    self._wait_for_etherscan_slot()
                     response = requests.get(url, params=params, timeout=10)
                     
                     if response.status_code == 429:
@@ -561,6 +579,7 @@ class BlockchainBalanceFetcher:
             
             for attempt in range(retry_count):
                 try:
+                    self._wait_for_etherscan_slot()
                     response = requests.get(url, params=params, timeout=10)
                     
                     if response.status_code == 429:
@@ -1258,23 +1277,16 @@ class BlockchainBalanceFetcher:
                 return ("ETH", eth_val)
             return ("ETH", None)
             
-        def get_erc20_balances():
-            projected_tokens = {}
-            if "eth_address" in wallet_config and wallet_config["eth_address"] and "erc20_tokens" in wallet_config:
-                print(f"  [Parallel] Starting ERC-20 token fetches ({len(wallet_config['erc20_tokens'])} tokens)...")
-                # We can even parallelize these sub-tasks if we wanted, but sticking to per-chain parallelization usually suffices
-                for token in wallet_config["erc20_tokens"]:
-                    symbol = token["symbol"]
-                    contract = token["contract"]
-                    decimals = token.get("decimals", 18)
-                    token_val = self.fetch_erc20_token_balance(
-                        wallet_config["eth_address"], 
-                        contract, 
-                        decimals
-                    )
-                    if token_val is not None:
-                        projected_tokens[symbol] = token_val
-            return ("ERC20", projected_tokens)
+        def get_erc20_balance(token):
+            # One task per token so token lookups overlap with each other and the other chains
+            token_val = self.fetch_erc20_token_balance(
+                wallet_config["eth_address"], 
+                token["contract"], 
+                token.get("decimals", 18)
+            )
+            if token_val is not None:
+                return ("ERC20", {token["symbol"]: token_val})
+            return ("ERC20", {})
 
         def get_xrp_balance():
             if "xrp_address" in wallet_config and wallet_config["xrp_address"]:
@@ -1290,15 +1302,20 @@ class BlockchainBalanceFetcher:
                 return ("SOL", sol_val)
             return ("SOL", None)
 
-        # Execute in parallel
+        erc20_tokens = []
+        if "eth_address" in wallet_config and wallet_config["eth_address"] and "erc20_tokens" in wallet_config:
+            erc20_tokens = wallet_config["erc20_tokens"]
+            print(f"  [Parallel] Starting ERC-20 token fetches ({len(erc20_tokens)} tokens)...")
+
+        # Execute in parallel; Etherscan calls are spaced by _wait_for_etherscan_slot
         with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
             futures = [
                 executor.submit(get_btc_balance),
                 executor.submit(get_eth_balance),
-                executor.submit(get_erc20_balances),
                 executor.submit(get_xrp_balance),
                 executor.submit(get_sol_balance)
             ]
+            futures.extend(executor.submit(get_erc20_balance, token) for token in erc20_tokens)
             
             for future in concurrent.futures.as_completed(futures):
                 try:
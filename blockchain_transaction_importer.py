@@ -31,6 +31,17 @@ except ImportError as e:
 
 import requests
 
+from json_utils import response_json
+
+
+# Keep-alive session for the per-transaction price lookups, so each request
+# after the first reuses the TLS connection to CoinGecko
+_SESSION = requests.Session()
+
+# Daily prices already fetched this run, keyed by (coin_id, 'dd-mm-yyyy'); the
+# history endpoint has one price per day, so transactions on the same day share it
+_HISTORICAL_PRICE_CACHE: Dict[Tuple[str, str], float] = {}
+
 
 def get_historical_price_for_date(
     symbol: str,
@@ -48,14 +59,25 @@ def get_historical_price_for_date(
     Returns:
         Price in AUD for that date, or None if not found
     """
-    if symbol.upper() not in COIN_IDS:
+    coin_id = COIN_IDS.get(symbol.upper())
+    if coin_id is None:
         return None
     
-    coin_id = COIN_IDS[symbol.upper()]
-    
+    date_str = target_date.strftime("%d-%m-%Y")
+    key = (coin_id, date_str)
+    price = _HISTORICAL_PRICE_CACHE.get(key)
+    if price is None:
+        # Failures are not cached so a later transaction retries the day
+        price = _fetch_historical_price(coin_id, date_str, retry_count)
+        if price is not None:
+            _HISTORICAL_PRICE_CACHE[key] = price
+    return price
+
+
+def _fetch_historical_price(coin_id: str, date_str: str, retry_count: int) -> Optional[float]:
+    """Request one day's price for a coin from CoinGecko (date_str is dd-mm-yyyy)"""
     # CoinGecko historical price endpoint
     # Format: /coins/{id}/history?date={dd-mm-yyyy}
-    date_str = target_date.strftime("%d-%m-%Y")
     url = f"{COINGECKO_BASE_URL}/coins/{coin_id}/history"
     params = {
         "date": date_str,
@@ -64,7 +86,7 @@ def get_historical_price_for_date(
     
     for attempt in range(retry_count):
         try:
-            response = requests.get(url, params=params, timeout=API_TIMEOUT)
+            response = _SESSION.get(url, params=params, timeout=API_TIMEOUT)
             
             if response.status_code == 429:
                 if attempt < retry_count - 1:
@@ -76,7 +98,7 @@ def get_historical_price_for_date(
                 return None
             
             response.raise_for_status()
-            data = response.json()
+            data = response_json(response)
             
             # Extract price from market_data
             if "market_data" in data and "current_price" in data["market_data"]:
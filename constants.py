@@ -19,6 +19,9 @@ COIN_IDS = {
     "WLFI": "world-liberty-financial"
 }
 
+# Reverse of COIN_IDS for keying API responses by symbol
+COIN_ID_TO_SYMBOL = {coin_id: symbol for symbol, coin_id in COIN_IDS.items()}
+
 # Coin name mapping (symbol -> full name)
 COIN_NAMES = {
     "BTC": "Bitcoin",
@@ -55,11 +58,13 @@ STRONG_PRICE_DROP_THRESHOLD = -5.0  # 24h price change threshold for strong bear
 API_RETRY_COUNT = 3
 API_TIMEOUT = 10
 API_RATE_LIMIT_BACKOFF_BASE = 2  # Base seconds for exponential backoff
+MARKET_DATA_CACHE_TTL = 60  # Seconds to reuse a CoinGecko market response (its update cadence)
 
 # Rate limiting configuration for historical price fetching
 HISTORICAL_PRICE_FETCH_DELAY = 7  # Seconds between historical price fetches
 RATE_LIMIT_SAFE_THRESHOLD = 2  # Stop fetching if remaining requests < this
 MAX_HISTORICAL_FETCHES_PER_RUN = 3  # Limit number of fetches per run to avoid rate limits
+HISTORICAL_PRICES_CACHE_TTL = 3600  # Seconds to reuse a fetched daily price series within a process
 
 # Currency
 DEFAULT_CURRENCY = "aud"
@@ -66,6 +66,10 @@ import pickle
 
 import threading
 
+# Bump whenever Asset / MarketAnalysis change layout (e.g. slots, frozen): a
+# pickle of the old classes can load without error but with fields scrambled
+PORTFOLIO_CACHE_VERSION = 2
+
 # Thread-safe cache implementation
 class PortfolioCache:
     def __init__(self):
@@ -94,6 +98,9 @@ class PortfolioCache:
                         print("Loading portfolio data from disk cache...")
                         with open(self.file_path, 'rb') as f:
                             data = pickle.load(f)
+                        if data.get('version') != PORTFOLIO_CACHE_VERSION:
+                            print("Discarding disk cache written by an older version")
+                        else:
                             self.portfolio = data.get('portfolio')
                             self.analyses = data.get('analyses')
                             self.market_data = data.get('market_data')
@@ -114,6 +121,7 @@ class PortfolioCache:
             try:
                 with open(self.file_path, 'wb') as f:
                     pickle.dump({
+                        'version': PORTFOLIO_CACHE_VERSION,
                         'portfolio': self.portfolio,
                         'analyses': self.analyses,
                         'market_data': self.market_data,
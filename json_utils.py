@@ -0,0 +1,23 @@
+"""
+JSON decoding shared by the modules that parse API responses
+"""
+
+import json
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+def loads_json(payload):
+    """Decode JSON bytes or text with orjson when installed, else the stdlib decoder"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(payload)
+    return json.loads(payload)
+
+
+def response_json(response):
+    """Decode a requests response body (raises ValueError on malformed JSON)"""
+    return loads_json(response.content)
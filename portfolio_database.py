@@ -5,10 +5,125 @@ Handles SQLite database operations for storing historical portfolio data
 
 import sqlite3
 import json
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from itertools import islice
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Tuple
 from pathlib import Path
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, replace
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+def _adapt_datetime(value: datetime) -> str:
+    """Store datetimes in the 'YYYY-MM-DD HH:MM:SS' layout used by existing rows"""
+    return value.isoformat(" ", "seconds")
+
+
+def _convert_timestamp(value: bytes) -> datetime:
+    """Parse a 'YYYY-MM-DD HH:MM:SS' column (fromisoformat is C-level, unlike strptime)"""
+    text = value.decode()
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        # Legacy rows with trailing data (e.g. a timezone name) after the seconds
+        return datetime.strptime(text[:19], "%Y-%m-%d %H:%M:%S")
+
+
+def _convert_day(value: bytes) -> Optional[datetime]:
+    """Parse a 'YYYY-MM-DD' column into a midnight datetime (None if malformed)"""
+    try:
+        return datetime.fromisoformat(value.decode())
+    except ValueError:
+        return None
+
+
+# Rows per executemany() call for bulk writes (bounds the parameter list size)
+BULK_INSERT_BATCH_SIZE = 10000
+
+def _batched(rows: Iterable[tuple], size: int = BULK_INSERT_BATCH_SIZE) -> Iterator[List[tuple]]:
+    """Yield lists of at most `size` rows"""
+    iterator = iter(rows)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+# Converters for the "[portfolio_timestamp]" / "[portfolio_day]" column tags in
+# this module's queries. Converter registration is process-wide, so the names
+# are unique to this module; datetime parameters go through _adapt_datetime
+# explicitly instead of a global adapter, leaving other modules' connections
+# (transaction_tracker, dashboard_api) with sqlite3's defaults.
+sqlite3.register_converter("portfolio_timestamp", _convert_timestamp)
+sqlite3.register_converter("portfolio_day", _convert_day)
+
+
+# INSERT ... RETURNING needs SQLite 3.35+; older libraries look the id up afterwards
+SQLITE_SUPPORTS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+# Upserts shared by save_snapshot() and save_snapshots_bulk()
+_SNAPSHOT_UPSERT_SQL = """
+    INSERT INTO portfolio_snapshots 
+    (timestamp, total_value, asset_count)
+    VALUES (?, ?, ?)
+    ON CONFLICT(timestamp) DO UPDATE SET
+        total_value = excluded.total_value,
+        asset_count = excluded.asset_count
+"""
+
+_HOLDING_UPSERT_SQL = """
+    INSERT INTO asset_holdings 
+    (snapshot_id, symbol, name, amount, price, value, allocation_percent)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(snapshot_id, symbol) DO UPDATE SET
+        name = excluded.name,
+        amount = excluded.amount,
+        price = excluded.price,
+        value = excluded.value,
+        allocation_percent = excluded.allocation_percent
+"""
+
+_ANALYSIS_UPSERT_SQL = """
+    INSERT INTO market_analysis
+    (snapshot_id, symbol, price_change_24h, price_change_7d, price_change_30d,
+     volatility, momentum, risk_adjusted_momentum, trend, recommendation,
+     reason, suggested_action)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(snapshot_id, symbol) DO UPDATE SET
+        price_change_24h = excluded.price_change_24h,
+        price_change_7d = excluded.price_change_7d,
+        price_change_30d = excluded.price_change_30d,
+        volatility = excluded.volatility,
+        momentum = excluded.momentum,
+        risk_adjusted_momentum = excluded.risk_adjusted_momentum,
+        trend = excluded.trend,
+        recommendation = excluded.recommendation,
+        reason = excluded.reason,
+        suggested_action = excluded.suggested_action
+"""
+
+
+@dataclass(slots=True, frozen=True)
+class AssetRow:
+    """A single asset holding within a portfolio snapshot"""
+    name: Optional[str]
+    amount: float
+    price: float
+    value: float
+    allocation_percent: float
+    
+    def __getitem__(self, key: str):
+        """Dict-style access (row['amount']), as on the dict rows snapshots used to hold"""
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+    
+    def get(self, key: str, default=None):
+        """dict.get() counterpart of __getitem__"""
+        try:
+            return self[key]
+        except KeyError:
+            return default
 
 
 @dataclass
@@ -16,7 +131,7 @@ class PortfolioSnapshot:
     """Represents a single portfolio snapshot at a point in time"""
     timestamp: datetime
     total_value: float
-    assets: Dict[str, Dict]  # symbol -> {amount, price, value, allocation_percent}
+    assets: Dict[str, AssetRow]  # symbol -> holding
 
 
 class PortfolioDatabase:
@@ -31,16 +146,26 @@ class PortfolioDatabase:
         """
         self.db_path = db_path
         self.conn = None
+        self._cursor = None
+        # Memoized lookups: symbol -> (data_version, latest date), (data_version, snapshot).
+        # PRAGMA data_version changes when another connection commits, and this
+        # instance's own writes clear the entries they affect.
+        self._latest_price_date_cache: Dict[str, Tuple[int, Optional[datetime]]] = {}
+        self._latest_snapshot_cache: Optional[Tuple[int, Optional[PortfolioSnapshot]]] = None
         self._initialize_database()
         # Initialize transaction tracker (lazy import to avoid circular dependencies)
         self._transaction_tracker = None
     
     def _initialize_database(self):
         """Create database tables if they don't exist"""
-        self.conn = sqlite3.connect(self.db_path)
+        self.conn = sqlite3.connect(
+            self.db_path,
+            detect_types=sqlite3.PARSE_COLNAMES
+        )
         self.conn.row_factory = sqlite3.Row  # Enable column access by name
         
-        cursor = self.conn.cursor()
+        # One cursor per connection, reused by the write paths and small lookups
+        self._cursor = cursor = self.conn.cursor()
         
         # Optimize SQLite performance
         cursor.execute("PRAGMA journal_mode=WAL;")
@@ -49,17 +174,29 @@ class PortfolioDatabase:
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS portfolio_snapshots (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp TEXT NOT NULL UNIQUE,
+                timestamp TIMESTAMP NOT NULL UNIQUE,
                 total_value REAL NOT NULL,
                 asset_count INTEGER NOT NULL,
-                created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+                created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                day TEXT GENERATED ALWAYS AS (substr(timestamp, 1, 10)) VIRTUAL
             )
         """)
         
+        # Older databases predate the generated 'day' column (ALTER TABLE can
+        # only add VIRTUAL generated columns, which is all the index needs)
+        snapshot_columns = {
+            info['name']
+            for info in cursor.execute("PRAGMA table_xinfo(portfolio_snapshots)").fetchall()
+        }
+        if 'day' not in snapshot_columns:
+            cursor.execute("""
+                ALTER TABLE portfolio_snapshots
+                ADD COLUMN day TEXT GENERATED ALWAYS AS (substr(timestamp, 1, 10)) VIRTUAL
+            """)
+        
         # Table for individual asset holdings in each snapshot
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS asset_holdings (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
+        self._create_without_rowid_table(cursor, "asset_holdings", """
+            CREATE TABLE {table} (
                 snapshot_id INTEGER NOT NULL,
                 symbol TEXT NOT NULL,
                 name TEXT,
@@ -67,15 +204,14 @@ class PortfolioDatabase:
                 price REAL NOT NULL,
                 value REAL NOT NULL,
                 allocation_percent REAL NOT NULL,
-                FOREIGN KEY (snapshot_id) REFERENCES portfolio_snapshots(id) ON DELETE CASCADE,
-                UNIQUE(snapshot_id, symbol)
-            )
+                PRIMARY KEY (snapshot_id, symbol),
+                FOREIGN KEY (snapshot_id) REFERENCES portfolio_snapshots(id) ON DELETE CASCADE
+            ) WITHOUT ROWID
         """)
         
         # Table for market analysis data (recommendations, trends, etc.)
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS market_analysis (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
+        self._create_without_rowid_table(cursor, "market_analysis", """
+            CREATE TABLE {table} (
                 snapshot_id INTEGER NOT NULL,
                 symbol TEXT NOT NULL,
                 price_change_24h REAL,
@@ -88,55 +224,48 @@ class PortfolioDatabase:
                 recommendation TEXT,
                 reason TEXT,
                 suggested_action TEXT,
-                FOREIGN KEY (snapshot_id) REFERENCES portfolio_snapshots(id) ON DELETE CASCADE,
-                UNIQUE(snapshot_id, symbol)
-            )
+                PRIMARY KEY (snapshot_id, symbol),
+                FOREIGN KEY (snapshot_id) REFERENCES portfolio_snapshots(id) ON DELETE CASCADE
+            ) WITHOUT ROWID
         """)
         
         # Create indexes for faster queries
+        # (snapshot_id lookups on holdings/analysis are served by their primary keys)
         cursor.execute("""
             CREATE INDEX IF NOT EXISTS idx_snapshots_timestamp 
             ON portfolio_snapshots(timestamp)
         """)
         
+        # Serves per-day lookups and the per-day ranking in cleanup_old_snapshots
         cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_holdings_snapshot 
-            ON asset_holdings(snapshot_id)
+            CREATE INDEX IF NOT EXISTS idx_snapshots_day 
+            ON portfolio_snapshots(day, timestamp DESC)
         """)
         
         cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_holdings_symbol 
-            ON asset_holdings(symbol)
+            CREATE INDEX IF NOT EXISTS idx_snapshots_id_timestamp 
+            ON portfolio_snapshots(id, timestamp)
         """)
         
+        # Covering index for get_asset_history (supersedes the symbol-only index)
+        cursor.execute("DROP INDEX IF EXISTS idx_holdings_symbol")
         cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_analysis_snapshot 
-            ON market_analysis(snapshot_id)
+            CREATE INDEX IF NOT EXISTS idx_holdings_symbol_snapshot 
+            ON asset_holdings(symbol, snapshot_id, amount, price, value)
         """)
         
         # Table for historical daily prices (for technical indicators)
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS historical_prices (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
+        # The (symbol, date) primary key also serves the per-symbol range scans
+        self._create_without_rowid_table(cursor, "historical_prices", """
+            CREATE TABLE {table} (
                 symbol TEXT NOT NULL,
                 date TEXT NOT NULL,
                 price REAL NOT NULL,
                 volume_24h REAL,
                 market_cap REAL,
                 created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE(symbol, date)
-            )
-        """)
-        
-        # Create indexes for historical prices
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_historical_prices_symbol_date 
-            ON historical_prices(symbol, date DESC)
-        """)
-        
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_historical_prices_symbol 
-            ON historical_prices(symbol)
+                PRIMARY KEY (symbol, date)
+            ) WITHOUT ROWID
         """)
         
         # Table for risk metrics
@@ -180,8 +309,95 @@ class PortfolioDatabase:
             ON asset_correlations(symbol1, symbol2, date)
         """)
         
+        # Gather planner statistics once so the covering indexes get picked;
+        # close() keeps them current with PRAGMA optimize
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'"
+        )
+        if cursor.fetchone() is None:
+            cursor.execute("ANALYZE")
+        
+        self.conn.commit()
+        
+        # Enforce ON DELETE CASCADE from snapshots to holdings/analysis. Enabled
+        # after the migrations above, which rebuild tables with FK checks off.
+        cursor.execute("PRAGMA foreign_keys=ON;")
+    
+    def _create_without_rowid_table(self, cursor, table: str, create_sql: str):
+        """
+        Create a WITHOUT ROWID table, migrating a legacy rowid version in place
+        
+        Older databases stored these tables with a synthetic id column plus a
+        UNIQUE compound key. Their rows are copied (minus the id) into the new
+        layout once; afterwards this is a single sqlite_master lookup.
+        
+        Args:
+            cursor: Cursor on self.conn
+            table: Table name
+            create_sql: CREATE TABLE statement with a {table} placeholder
+        """
+        cursor.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?",
+            (table,)
+        )
+        row = cursor.fetchone()
+        if row is None:
+            cursor.execute(create_sql.format(table=table))
+            return
+        if "WITHOUT ROWID" in row['sql'].upper():
+            return
+        
+        columns = ", ".join(
+            info['name']
+            for info in cursor.execute(f"PRAGMA table_info({table})").fetchall()
+            if info['name'] != 'id'
+        )
+        migrated = f"{table}_migrated"
+        cursor.execute(f"DROP TABLE IF EXISTS {migrated}")
+        cursor.execute(create_sql.format(table=migrated))
+        cursor.execute(f"""
+            INSERT OR REPLACE INTO {migrated} ({columns})
+            SELECT {columns} FROM {table} ORDER BY id
+        """)
+        cursor.execute(f"DROP TABLE {table}")
+        cursor.execute(f"ALTER TABLE {migrated} RENAME TO {table}")
         self.conn.commit()
     
+    @contextmanager
+    def _immediate_transaction(self):
+        """Run the enclosed statements in one BEGIN IMMEDIATE transaction"""
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self.conn.rollback()
+            raise
+        self.conn.commit()
+    
+    @contextmanager
+    def read_transaction(self):
+        """
+        Run several reads against one consistent snapshot of the database
+        
+        A single deferred transaction holds the WAL read lock across the
+        enclosed queries instead of taking it once per statement. Nested use
+        joins the transaction already in progress.
+        """
+        if self.conn.in_transaction:
+            yield self
+            return
+        self.conn.execute("BEGIN")
+        try:
+            yield self
+        finally:
+            self.conn.commit()
+    
+    def _raw_execute(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        """Execute a query on a cursor that yields plain tuples instead of sqlite3.Row"""
+        cursor = self.conn.cursor()
+        cursor.row_factory = None
+        return cursor.execute(sql, params)
+    
     def save_snapshot(
         self, 
         portfolio: Dict[str, any], 
@@ -202,83 +418,171 @@ class PortfolioDatabase:
         if timestamp is None:
             timestamp = datetime.now()
         
-        timestamp_str = timestamp.strftime("%Y-%m-%d %H:%M:%S")
-        
         # Calculate total portfolio value
         total_value = sum(asset.value for asset in portfolio.values())
         asset_count = len(portfolio)
         
-        cursor = self.conn.cursor()
+        cursor = self._cursor
         
-        # Insert or replace snapshot (use INSERT OR REPLACE for same-day snapshots)
-        cursor.execute("""
-            INSERT OR REPLACE INTO portfolio_snapshots 
-            (timestamp, total_value, asset_count)
-            VALUES (?, ?, ?)
-        """, (timestamp_str, total_value, asset_count))
+        # Upsert the snapshot so a same-timestamp save keeps its id (and FKs)
+        snapshot_id = self._upsert_snapshot(timestamp, total_value, asset_count)
         
-        snapshot_id = cursor.lastrowid
+        # Drop rows for assets no longer in the portfolio (no-op for a new snapshot)
+        symbols = [asset.symbol for asset in portfolio.values()]
+        placeholders = ",".join("?" * len(symbols))
+        cursor.execute(f"""
+            DELETE FROM asset_holdings
+            WHERE snapshot_id = ? AND symbol NOT IN ({placeholders})
+        """, (snapshot_id, *symbols))
+        
+        # Upsert asset holdings
+        cursor.executemany(
+            _HOLDING_UPSERT_SQL,
+            [self._holding_row(snapshot_id, asset) for asset in portfolio.values()]
+        )
+        
+        # Upsert market analysis if provided
+        analysis_symbols = [analysis.symbol for analysis in market_analyses or []]
+        placeholders = ",".join("?" * len(analysis_symbols))
+        cursor.execute(f"""
+            DELETE FROM market_analysis
+            WHERE snapshot_id = ? AND symbol NOT IN ({placeholders})
+        """, (snapshot_id, *analysis_symbols))
         
-        # If snapshot already existed, get its ID
-        if snapshot_id == 0:
-            cursor.execute("""
-                SELECT id FROM portfolio_snapshots WHERE timestamp = ?
-            """, (timestamp_str,))
-            row = cursor.fetchone()
-            if row:
-                snapshot_id = row['id']
-                # Delete old asset holdings and analysis for this snapshot
-                cursor.execute("DELETE FROM asset_holdings WHERE snapshot_id = ?", (snapshot_id,))
-                cursor.execute("DELETE FROM market_analysis WHERE snapshot_id = ?", (snapshot_id,))
-        
-        # Insert asset holdings
-        for symbol, asset in portfolio.items():
-            cursor.execute("""
-                INSERT INTO asset_holdings 
-                (snapshot_id, symbol, name, amount, price, value, allocation_percent)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (
-                snapshot_id,
-                asset.symbol,
-                asset.name,
-                asset.amount,
-                asset.current_price,
-                asset.value,
-                asset.allocation_percent
-            ))
-        
-        # Insert market analysis if provided
         if market_analyses:
-            for analysis in market_analyses:
-                cursor.execute("""
-                    INSERT INTO market_analysis
-                    (snapshot_id, symbol, price_change_24h, price_change_7d, price_change_30d,
-                     volatility, momentum, risk_adjusted_momentum, trend, recommendation,
-                     reason, suggested_action)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    snapshot_id,
-                    analysis.symbol,
-                    analysis.price_change_24h,
-                    analysis.price_change_7d,
-                    analysis.price_change_30d,
-                    analysis.volatility,
-                    analysis.momentum,
-                    analysis.risk_adjusted_momentum,
-                    analysis.trend,
-                    analysis.recommendation.value if hasattr(analysis.recommendation, 'value') else str(analysis.recommendation),
-                    analysis.reason,
-                    analysis.suggested_action
-                ))
+            cursor.executemany(
+                _ANALYSIS_UPSERT_SQL,
+                [self._analysis_row(snapshot_id, analysis) for analysis in market_analyses]
+            )
         
         self.conn.commit()
+        self._latest_snapshot_cache = None
         return snapshot_id
     
+    def save_snapshots_bulk(
+        self,
+        entries: List[Tuple[datetime, Dict[str, any], Optional[List[any]]]]
+    ) -> List[int]:
+        """
+        Save many portfolio snapshots in a single transaction (for backfills)
+        
+        Snapshots are upserted one statement each (executemany cannot return
+        their ids); their holdings and analysis rows are then written with batched
+        executemany calls. An existing snapshot at the same timestamp has its
+        holdings and analysis replaced, as with save_snapshot().
+        
+        Args:
+            entries: List of (timestamp, portfolio, market_analyses) tuples, where
+                     portfolio maps symbols to Asset objects and market_analyses
+                     is an optional list of MarketAnalysis objects
+            
+        Returns:
+            List of snapshot ids, in the same order as entries
+        """
+        cursor = self._cursor
+        snapshot_ids = []
+        holding_rows = []
+        analysis_rows = []
+        
+        # Skip per-row FK checks for the batch (the pragma is a no-op inside a
+        # transaction, so it is toggled around it)
+        self.conn.execute("PRAGMA foreign_keys=OFF;")
+        try:
+            with self._immediate_transaction():
+                for timestamp, portfolio, market_analyses in entries:
+                    total_value = sum(asset.value for asset in portfolio.values())
+                    snapshot_id = self._upsert_snapshot(timestamp, total_value, len(portfolio))
+                    snapshot_ids.append(snapshot_id)
+                    
+                    holding_rows.extend(
+                        self._holding_row(snapshot_id, asset) for asset in portfolio.values()
+                    )
+                    analysis_rows.extend(
+                        self._analysis_row(snapshot_id, analysis)
+                        for analysis in market_analyses or []
+                    )
+                
+                id_rows = [(snapshot_id,) for snapshot_id in snapshot_ids]
+                cursor.executemany("DELETE FROM asset_holdings WHERE snapshot_id = ?", id_rows)
+                cursor.executemany("DELETE FROM market_analysis WHERE snapshot_id = ?", id_rows)
+                for batch in _batched(holding_rows):
+                    cursor.executemany(_HOLDING_UPSERT_SQL, batch)
+                for batch in _batched(analysis_rows):
+                    cursor.executemany(_ANALYSIS_UPSERT_SQL, batch)
+        finally:
+            self.conn.execute("PRAGMA foreign_keys=ON;")
+        
+        self._latest_snapshot_cache = None
+        return snapshot_ids
+    
+    def _upsert_snapshot(self, timestamp: datetime, total_value: float, asset_count: int) -> int:
+        """Insert or update the snapshot row for a timestamp and return its id"""
+        cursor = self._cursor
+        timestamp = _adapt_datetime(timestamp)
+        if SQLITE_SUPPORTS_RETURNING:
+            cursor.execute(
+                _SNAPSHOT_UPSERT_SQL + " RETURNING id",
+                (timestamp, total_value, asset_count)
+            )
+            return cursor.fetchone()[0]
+        
+        cursor.execute(_SNAPSHOT_UPSERT_SQL, (timestamp, total_value, asset_count))
+        cursor.execute("SELECT id FROM portfolio_snapshots WHERE timestamp = ?", (timestamp,))
+        return cursor.fetchone()['id']
+    
+    @staticmethod
+    def _holding_row(snapshot_id: int, asset) -> tuple:
+        """Parameters for _HOLDING_UPSERT_SQL"""
+        return (
+            snapshot_id,
+            asset.symbol,
+            asset.name,
+            asset.amount,
+            asset.current_price,
+            asset.value,
+            asset.allocation_percent
+        )
+    
+    @staticmethod
+    def _analysis_row(snapshot_id: int, analysis) -> tuple:
+        """Parameters for _ANALYSIS_UPSERT_SQL"""
+        return (
+            snapshot_id,
+            analysis.symbol,
+            analysis.price_change_24h,
+            analysis.price_change_7d,
+            analysis.price_change_30d,
+            analysis.volatility,
+            analysis.momentum,
+            analysis.risk_adjusted_momentum,
+            analysis.trend,
+            analysis.recommendation.value if hasattr(analysis.recommendation, 'value') else str(analysis.recommendation),
+            analysis.reason,
+            analysis.suggested_action
+        )
+    
+    def _data_version(self) -> int:
+        """PRAGMA data_version: changes whenever another connection commits to the database"""
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+    
     def get_latest_snapshot(self) -> Optional[PortfolioSnapshot]:
-        """Get the most recent portfolio snapshot"""
-        cursor = self.conn.cursor()
+        """Get the most recent portfolio snapshot (memoized until the database changes)"""
+        version = self._data_version()
+        cached = self._latest_snapshot_cache
+        if cached is None or cached[0] != version:
+            cached = self._latest_snapshot_cache = (version, self._fetch_latest_snapshot())
+        
+        snapshot = cached[1]
+        if snapshot is None:
+            return None
+        # Callers get their own snapshot and assets dict (AssetRow is frozen)
+        return replace(snapshot, assets=dict(snapshot.assets))
+    
+    def _fetch_latest_snapshot(self) -> Optional[PortfolioSnapshot]:
+        """Read the most recent portfolio snapshot from the database"""
+        cursor = self._cursor
         cursor.execute("""
-            SELECT id, timestamp, total_value 
+            SELECT id, timestamp AS "timestamp [portfolio_timestamp]", total_value 
             FROM portfolio_snapshots 
             ORDER BY timestamp DESC 
             LIMIT 1
@@ -289,24 +593,17 @@ class PortfolioDatabase:
             return None
         
         snapshot_id = row['id']
-        timestamp = datetime.strptime(row['timestamp'], "%Y-%m-%d %H:%M:%S")
+        timestamp = row['timestamp']
         
         # Get asset holdings
-        cursor.execute("""
-            SELECT symbol, name, amount, price, value, allocation_percent
-            FROM asset_holdings
-            WHERE snapshot_id = ?
-        """, (snapshot_id,))
-        
-        assets = {}
-        for asset_row in cursor.fetchall():
-            assets[asset_row['symbol']] = {
-                'name': asset_row['name'],
-                'amount': asset_row['amount'],
-                'price': asset_row['price'],
-                'value': asset_row['value'],
-                'allocation_percent': asset_row['allocation_percent']
-            }
+        assets = {
+            symbol: AssetRow(*holding)
+            for symbol, *holding in self._raw_execute("""
+                SELECT symbol, name, amount, price, value, allocation_percent
+                FROM asset_holdings
+                WHERE snapshot_id = ?
+            """, (snapshot_id,))
+        }
         
         return PortfolioSnapshot(
             timestamp=timestamp,
@@ -314,6 +611,36 @@ class PortfolioDatabase:
             assets=assets
         )
     
+    def get_latest_market_data(self) -> Dict[str, Dict]:
+        """
+        Prices and price changes recorded with the most recent snapshot
+        
+        Returns:
+            Dictionary in the shape PortfolioEvaluator.fetch_market_data returns
+            (market cap and volume are not stored and read as 0); empty if there
+            are no snapshots
+        """
+        rows = self._raw_execute("""
+            SELECT h.symbol, h.price, a.price_change_24h, a.price_change_7d, a.price_change_30d
+            FROM asset_holdings h
+            LEFT JOIN market_analysis a
+                ON a.snapshot_id = h.snapshot_id AND a.symbol = h.symbol
+            WHERE h.snapshot_id = (
+                SELECT id FROM portfolio_snapshots ORDER BY timestamp DESC LIMIT 1
+            )
+        """)
+        return {
+            symbol: {
+                "current_price": price,
+                "price_change_24h": change_24h,
+                "price_change_7d": change_7d,
+                "price_change_30d": change_30d,
+                "market_cap": 0,
+                "volume_24h": 0
+            }
+            for symbol, price, change_24h, change_7d, change_30d in rows
+        }
+    
     def get_portfolio_history(
         self, 
         days: Optional[int] = None,
@@ -331,57 +658,44 @@ class PortfolioDatabase:
         Returns:
             List of PortfolioSnapshot objects
         """
-        cursor = self.conn.cursor()
-        
         if days:
             start_date = datetime.now() - timedelta(days=days)
             end_date = datetime.now()
         
+        range_clause = ""
+        params = ()
         if start_date and end_date:
-            start_str = start_date.strftime("%Y-%m-%d %H:%M:%S")
-            end_str = end_date.strftime("%Y-%m-%d %H:%M:%S")
-            cursor.execute("""
-                SELECT id, timestamp, total_value 
-                FROM portfolio_snapshots 
-                WHERE timestamp BETWEEN ? AND ?
-                ORDER BY timestamp ASC
-            """, (start_str, end_str))
-        else:
-            cursor.execute("""
-                SELECT id, timestamp, total_value 
-                FROM portfolio_snapshots 
-                ORDER BY timestamp ASC
-            """)
-        
-        snapshots = []
-        for row in cursor.fetchall():
-            snapshot_id = row['id']
-            timestamp = datetime.strptime(row['timestamp'], "%Y-%m-%d %H:%M:%S")
-            
-            # Get asset holdings for this snapshot
-            cursor.execute("""
-                SELECT symbol, name, amount, price, value, allocation_percent
-                FROM asset_holdings
-                WHERE snapshot_id = ?
-            """, (snapshot_id,))
-            
-            assets = {}
-            for asset_row in cursor.fetchall():
-                assets[asset_row['symbol']] = {
-                    'name': asset_row['name'],
-                    'amount': asset_row['amount'],
-                    'price': asset_row['price'],
-                    'value': asset_row['value'],
-                    'allocation_percent': asset_row['allocation_percent']
-                }
-            
-            snapshots.append(PortfolioSnapshot(
+            range_clause = "WHERE ps.timestamp BETWEEN ? AND ?"
+            params = (_adapt_datetime(start_date), _adapt_datetime(end_date))
+        
+        # Stream snapshots, then all of their holdings in one pass (instead of a
+        # holdings query per snapshot), stitching them together by snapshot id
+        snapshots: Dict[int, PortfolioSnapshot] = {}
+        for snapshot_id, timestamp, total_value in self._raw_execute(f"""
+            SELECT ps.id, ps.timestamp AS "timestamp [portfolio_timestamp]", ps.total_value 
+            FROM portfolio_snapshots ps
+            {range_clause}
+            ORDER BY ps.timestamp ASC
+        """, params):
+            snapshots[snapshot_id] = PortfolioSnapshot(
                 timestamp=timestamp,
-                total_value=row['total_value'],
-                assets=assets
-            ))
+                total_value=total_value,
+                assets={}
+            )
         
-        return snapshots
+        for snapshot_id, symbol, name, amount, price, value, allocation_percent in self._raw_execute(f"""
+            SELECT ah.snapshot_id, ah.symbol, ah.name, ah.amount, ah.price, ah.value,
+                   ah.allocation_percent
+            FROM asset_holdings ah
+            JOIN portfolio_snapshots ps ON ah.snapshot_id = ps.id
+            {range_clause}
+        """, params):
+            snapshot = snapshots.get(snapshot_id)
+            if snapshot is None:
+                continue  # Snapshot written after the first query ran
+            snapshot.assets[symbol] = AssetRow(name, amount, price, value, allocation_percent)
+        
+        return list(snapshots.values())
     
     def get_portfolio_value_history(
         self,
@@ -395,32 +709,26 @@ class PortfolioDatabase:
         Returns:
             List of (datetime, total_value) tuples
         """
-        cursor = self.conn.cursor()
-        
         if days:
             start_date = datetime.now() - timedelta(days=days)
             end_date = datetime.now()
         
         if start_date and end_date:
-            start_str = start_date.strftime("%Y-%m-%d %H:%M:%S")
-            end_str = end_date.strftime("%Y-%m-%d %H:%M:%S")
-            cursor.execute("""
-                SELECT timestamp, total_value 
+            cursor = self._raw_execute("""
+                SELECT timestamp AS "timestamp [portfolio_timestamp]", total_value 
                 FROM portfolio_snapshots 
                 WHERE timestamp BETWEEN ? AND ?
                 ORDER BY timestamp ASC
-            """, (start_str, end_str))
+            """, (_adapt_datetime(start_date), _adapt_datetime(end_date)))
         else:
-            cursor.execute("""
-                SELECT timestamp, total_value 
+            cursor = self._raw_execute("""
+                SELECT timestamp AS "timestamp [portfolio_timestamp]", total_value 
                 FROM portfolio_snapshots 
                 ORDER BY timestamp ASC
             """)
         
-        return [
-            (datetime.strptime(row['timestamp'], "%Y-%m-%d %H:%M:%S"), row['total_value'])
-            for row in cursor.fetchall()
-        ]
+        # Tuple rows already have the (datetime, total_value) shape callers expect
+        return cursor.fetchall()
     
     def get_asset_history(
         self,
@@ -437,36 +745,25 @@ class PortfolioDatabase:
         Returns:
             List of (timestamp, amount, price, value) tuples
         """
-        cursor = self.conn.cursor()
-        
         if days:
             start_date = datetime.now() - timedelta(days=days)
-            start_str = start_date.strftime("%Y-%m-%d %H:%M:%S")
-            cursor.execute("""
-                SELECT ps.timestamp, ah.amount, ah.price, ah.value
+            cursor = self._raw_execute("""
+                SELECT ps.timestamp AS "timestamp [portfolio_timestamp]", ah.amount, ah.price, ah.value
                 FROM asset_holdings ah
                 JOIN portfolio_snapshots ps ON ah.snapshot_id = ps.id
                 WHERE ah.symbol = ? AND ps.timestamp >= ?
                 ORDER BY ps.timestamp ASC
-            """, (symbol, start_str))
+            """, (symbol, _adapt_datetime(start_date)))
         else:
-            cursor.execute("""
-                SELECT ps.timestamp, ah.amount, ah.price, ah.value
+            cursor = self._raw_execute("""
+                SELECT ps.timestamp AS "timestamp [portfolio_timestamp]", ah.amount, ah.price, ah.value
                 FROM asset_holdings ah
                 JOIN portfolio_snapshots ps ON ah.snapshot_id = ps.id
                 WHERE ah.symbol = ?
                 ORDER BY ps.timestamp ASC
             """, (symbol,))
         
-        return [
-            (
-                datetime.strptime(row['timestamp'], "%Y-%m-%d %H:%M:%S"),
-                row['amount'],
-                row['price'],
-                row['value']
-            )
-            for row in cursor.fetchall()
-        ]
+        return cursor.fetchall()
     
     def calculate_returns(
         self,
@@ -861,7 +1158,7 @@ class PortfolioDatabase:
     
     def get_snapshot_count(self) -> int:
         """Get total number of snapshots in database"""
-        cursor = self.conn.cursor()
+        cursor = self._cursor
         cursor.execute("SELECT COUNT(*) as count FROM portfolio_snapshots")
         row = cursor.fetchone()
         return row['count'] if row else 0
@@ -873,23 +1170,29 @@ class PortfolioDatabase:
         Args:
             keep_days: Keep all snapshots from the last N days
         """
-        cursor = self.conn.cursor()
+        cursor = self._cursor
         cutoff_date = datetime.now() - timedelta(days=keep_days)
-        cutoff_str = cutoff_date.strftime("%Y-%m-%d %H:%M:%S")
         
-        # For old snapshots, keep only one per day (the latest one)
-        cursor.execute("""
-            DELETE FROM portfolio_snapshots
-            WHERE timestamp < ? 
-            AND id NOT IN (
-                SELECT MAX(id)
-                FROM portfolio_snapshots
-                WHERE timestamp < ?
-                GROUP BY DATE(timestamp)
-            )
-        """, (cutoff_str, cutoff_str))
+        # For old snapshots, keep only one per day (the latest one). Snapshots are
+        # ranked within each indexed 'day'; holdings and analysis rows go with
+        # them via ON DELETE CASCADE.
+        with self._immediate_transaction():
+            cursor.execute("""
+                DELETE FROM portfolio_snapshots
+                WHERE id IN (
+                    SELECT id FROM (
+                        SELECT id, ROW_NUMBER() OVER (
+                            PARTITION BY day
+                            ORDER BY timestamp DESC
+                        ) AS day_rank
+                        FROM portfolio_snapshots
+                        WHERE timestamp < ?
+                    )
+                    WHERE day_rank > 1
+                )
+            """, (_adapt_datetime(cutoff_date),))
         
-        self.conn.commit()
+        self._latest_snapshot_cache = None
         return cursor.rowcount
     
     def save_historical_prices(
@@ -905,16 +1208,35 @@ class PortfolioDatabase:
             prices: List of tuples (date_str, price, volume_24h, market_cap)
                    date_str format: 'YYYY-MM-DD'
         """
-        cursor = self.conn.cursor()
+        self.save_historical_prices_bulk({symbol: prices})
+    
+    def save_historical_prices_bulk(
+        self,
+        prices_by_symbol: Dict[str, List[Tuple[str, float, Optional[float], Optional[float]]]]
+    ):
+        """
+        Save historical prices for several assets in one transaction
         
-        for date_str, price, volume_24h, market_cap in prices:
-            cursor.execute("""
-                INSERT OR REPLACE INTO historical_prices 
-                (symbol, date, price, volume_24h, market_cap)
-                VALUES (?, ?, ?, ?, ?)
-            """, (symbol, date_str, price, volume_24h, market_cap))
+        Args:
+            prices_by_symbol: Symbol -> list of (date_str, price, volume_24h, market_cap)
+        """
+        cursor = self._cursor
+        rows = (
+            (symbol, date_str, price, volume_24h, market_cap)
+            for symbol, prices in prices_by_symbol.items()
+            for date_str, price, volume_24h, market_cap in prices
+        )
         
-        self.conn.commit()
+        with self._immediate_transaction():
+            for batch in _batched(rows):
+                cursor.executemany("""
+                    INSERT OR REPLACE INTO historical_prices 
+                    (symbol, date, price, volume_24h, market_cap)
+                    VALUES (?, ?, ?, ?, ?)
+                """, batch)
+        
+        for symbol in prices_by_symbol:
+            self._latest_price_date_cache.pop(symbol, None)
     
     def get_historical_prices(
         self,
@@ -931,26 +1253,49 @@ class PortfolioDatabase:
         Returns:
             List of tuples (datetime, price) sorted by date (oldest first)
         """
-        cursor = self.conn.cursor()
         cutoff_date = datetime.now() - timedelta(days=days)
-        cutoff_str = cutoff_date.strftime("%Y-%m-%d")
         
-        cursor.execute("""
-            SELECT date, price 
+        cursor = self._raw_execute("""
+            SELECT date AS "date [portfolio_day]", price 
             FROM historical_prices
             WHERE symbol = ? AND date >= ?
             ORDER BY date ASC
-        """, (symbol, cutoff_str))
+        """, (symbol, cutoff_date.date().isoformat()))
         
-        results = []
-        for row in cursor.fetchall():
-            try:
-                date_obj = datetime.strptime(row['date'], "%Y-%m-%d")
-                results.append((date_obj, row['price']))
-            except ValueError:
-                continue
+        return [row for row in cursor if row[0] is not None]
+    
+    def get_historical_prices_arrays(
+        self,
+        symbol: str,
+        days: int = 200
+    ) -> Tuple["np.ndarray", "np.ndarray"]:
+        """
+        Get historical prices for an asset as NumPy arrays
+        
+        Columnar counterpart of get_historical_prices() for vectorized consumers.
+        
+        Args:
+            symbol: Asset symbol
+            days: Number of days of history to retrieve
+            
+        Returns:
+            Tuple of (dates as datetime64[D], prices as float64), oldest first
+        """
+        import numpy as np
         
-        return results
+        cutoff_date = datetime.now() - timedelta(days=days)
+        
+        # Read the raw 'YYYY-MM-DD' text; NumPy parses it straight into datetime64
+        rows = self._raw_execute("""
+            SELECT date, price
+            FROM historical_prices
+            WHERE symbol = ? AND date >= ?
+            ORDER BY date ASC
+        """, (symbol, cutoff_date.date().isoformat())).fetchall()
+        
+        dates = np.array([row[0] for row in rows], dtype='datetime64[D]')
+        prices = np.fromiter((row[1] for row in rows), dtype=np.float64, count=len(rows))
+        return dates, prices
     
     def get_latest_price_date(self, symbol: str) -> Optional[datetime]:
         """
@@ -962,26 +1307,35 @@ class PortfolioDatabase:
         Returns:
             Datetime of latest price or None if no data exists
         """
-        cursor = self.conn.cursor()
+        version = self._data_version()
+        cached = self._latest_price_date_cache.get(symbol)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        
+        cursor = self._cursor
         cursor.execute("""
-            SELECT MAX(date) as max_date
+            SELECT MAX(date) AS "max_date [portfolio_day]"
             FROM historical_prices
             WHERE symbol = ?
         """, (symbol,))
         
         row = cursor.fetchone()
-        if row and row['max_date']:
-            try:
-                return datetime.strptime(row['max_date'], "%Y-%m-%d")
-            except ValueError:
-                return None
-        return None
+        latest_date = row['max_date'] if row else None
+        self._latest_price_date_cache[symbol] = (version, latest_date)
+        return latest_date
     
     def close(self):
         """Close database connection"""
         if self.conn:
-            self.conn.close()
-            self.conn = None
+            try:
+                self.conn.execute("PRAGMA optimize")
+            except sqlite3.Error:
+                # Locked or read-only database: skip the statistics refresh
+                pass
+            finally:
+                self.conn.close()
+                self.conn = None
+                self._cursor = None
     
     def __enter__(self):
         """Context manager entry"""
@@ -4,22 +4,37 @@ Analyzes market conditions and provides buy/sell recommendations
 """
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import copy
 import json
+import hashlib
+import importlib.util
 import os
+import tempfile
 import time
 import sys
 import sqlite3
-import argparse
+import atexit
+import threading
+from collections import defaultdict
 from datetime import datetime, timedelta
-from typing import Dict, List, Tuple, Optional
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Tuple, Optional
 from dataclasses import dataclass
 from enum import Enum
 
 try:
-    from blockchain_balance_fetcher import BlockchainBalanceFetcher
-    BLOCKCHAIN_FETCHER_AVAILABLE = True
+    import numpy as np
+    NUMPY_AVAILABLE = True
 except ImportError:
-    BLOCKCHAIN_FETCHER_AVAILABLE = False
+    NUMPY_AVAILABLE = False
+
+# blockchain_balance_fetcher (and its pycoin/bip32 dependencies) is only
+# imported inside load_portfolio_from_wallet.
+# portfolio_rebalancer imports Asset from this module, so it can only be
+# imported once this module has finished loading
+REBALANCER_AVAILABLE = importlib.util.find_spec("portfolio_rebalancer") is not None
 
 try:
     from portfolio_database import PortfolioDatabase
@@ -28,23 +43,24 @@ except ImportError:
     DATABASE_AVAILABLE = False
 
 try:
-    from portfolio_rebalancer import PortfolioRebalancer
-    REBALANCER_AVAILABLE = True
+    from technical_indicators import TechnicalIndicators
+    TECH_INDICATORS_AVAILABLE = True
 except ImportError:
-    REBALANCER_AVAILABLE = False
+    TECH_INDICATORS_AVAILABLE = False
+    TechnicalIndicators = None
 
+from json_utils import loads_json, response_json
 from constants import (
     COINGECKO_BASE_URL,
     COIN_IDS,
+    COIN_ID_TO_SYMBOL,
     COIN_NAMES,
     API_RETRY_COUNT,
     API_TIMEOUT,
     API_RATE_LIMIT_BACKOFF_BASE,
+    MARKET_DATA_CACHE_TTL,
     DEFAULT_CURRENCY,
-    OVER_ALLOCATION_THRESHOLD,
     STRONG_MOMENTUM_THRESHOLD,
-    BEARISH_MOMENTUM_THRESHOLD,
-    MODERATE_BEARISH_THRESHOLD,
     HIGH_VOLATILITY_THRESHOLD,
     STRONG_PRICE_DROP_THRESHOLD,
     RSI_OVERSOLD,
@@ -54,11 +70,172 @@ from constants import (
     HISTORICAL_PRICE_FETCH_DELAY,
     RATE_LIMIT_SAFE_THRESHOLD,
     MAX_HISTORICAL_FETCHES_PER_RUN,
+    HISTORICAL_PRICES_CACHE_TTL,
     DCA_INCREASE_MULTIPLIER,
     DCA_DECREASE_MULTIPLIER
 )
 
 
+# On-disk copies of parsed market data, shared between CLI runs
+MARKET_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "portfolio_evaluator", "markets")
+
+# When False (--no-cache), cached market data is ignored and every price is
+# fetched fresh; responses are still stored so the next run starts warm
+MARKET_CACHE_ENABLED = True
+
+# Weights of the 24h, 7d and 30d changes in the momentum score
+MOMENTUM_WEIGHTS = (0.5, 0.3, 0.2)
+
+# Responses worth retrying: rate limits and transient server errors
+RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+# Process-wide cache of market responses: key -> (monotonic time stored, market_data).
+# Keys carry a "shared:market:coingecko" namespace so they can move to a shared
+# store later without touching callers.
+_MARKET_CACHE: Dict[tuple, Tuple[float, Dict]] = {}
+
+# Daily price series fetched by this process: (coin_id, days) -> (monotonic
+# time, prices). The database is the persistent copy; this stops a series that
+# is too short to be served from the database being requested twice in one run.
+_HISTORY_CACHE: Dict[Tuple[str, int], Tuple[float, List[Tuple[datetime, float]]]] = {}
+
+
+def _market_cache_key(coin_ids: List[str]) -> tuple:
+    return ("shared:market:coingecko", DEFAULT_CURRENCY, tuple(sorted(set(coin_ids))))
+
+
+def _cache_path(key: tuple) -> str:
+    digest = hashlib.md5(repr(key).encode("utf-8")).hexdigest()
+    return os.path.join(MARKET_CACHE_DIR, f"{digest}.json")
+
+
+def _cache_get(key: tuple, ttl: float = MARKET_DATA_CACHE_TTL) -> Optional[Dict]:
+    """
+    Return a deep copy of a cached market response if it is younger than ttl seconds
+    
+    Looks in this process's cache first, then in the file an earlier run left
+    in MARKET_CACHE_DIR. Unreadable or malformed files count as a miss, as does
+    every lookup while MARKET_CACHE_ENABLED is False.
+    """
+    if not MARKET_CACHE_ENABLED:
+        return None
+    cached = _MARKET_CACHE.get(key)
+    if cached is not None and time.monotonic() - cached[0] < ttl:
+        return copy.deepcopy(cached[1])
+    
+    try:
+        with open(_cache_path(key), "rb") as f:
+            entry = loads_json(f.read())
+        age = time.time() - entry["ts"]
+        data = entry["data"]
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    if not 0 <= age < ttl or not isinstance(data, dict):
+        return None
+    _MARKET_CACHE[key] = (time.monotonic() - age, data)
+    return copy.deepcopy(data)
+
+
+def _cache_put(key: tuple, value: Dict):
+    """
+    Cache a market response in memory and on disk
+    
+    The file is written to a temporary name and moved into place with
+    os.replace, so a concurrent run never reads a half-written entry.
+    Disk errors are ignored; the in-memory copy still serves this process.
+    """
+    _MARKET_CACHE[key] = (time.monotonic(), copy.deepcopy(value))
+    try:
+        os.makedirs(MARKET_CACHE_DIR, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=MARKET_CACHE_DIR, suffix=".tmp")
+    except OSError:
+        return
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"ts": time.time(), "data": value}, f)
+        os.replace(tmp_path, _cache_path(key))
+    except (OSError, TypeError, ValueError):
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+
+
+def _flush_lines(lines: List[str]):
+    """Write buffered report lines to stdout in a single call and empty the buffer"""
+    if lines:
+        sys.stdout.write("\n".join(lines) + "\n")
+        lines.clear()
+
+
+_HTTP_SESSION: Optional[requests.Session] = None
+
+
+def _http_session() -> requests.Session:
+    """
+    Pooled HTTP session shared by this module's CoinGecko calls
+    
+    Market data (including the wallet load's request), its /simple/price
+    fallback and historical prices all use it, so the wallet-load flow and
+    the evaluator that follows pay the TCP/TLS handshake once per host
+    rather than once per evaluator. Rate limits and transient server errors
+    are retried by urllib3 with exponential backoff, honouring
+    CoinGecko's Retry-After header. Responses are not cached here; parsed
+    market data is cached by _cache_get/_cache_put.
+    """
+    global _HTTP_SESSION
+    if _HTTP_SESSION is not None:
+        return _HTTP_SESSION
+    retry = Retry(
+        total=API_RETRY_COUNT,
+        backoff_factor=API_RATE_LIMIT_BACKOFF_BASE,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=frozenset(["GET"]),
+        respect_retry_after_header=True
+    )
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=10, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({
+        "Accept": "application/json",
+        "User-Agent": "portfolio-evaluator/1.0"
+    })
+    _HTTP_SESSION = session
+    atexit.register(session.close)
+    return session
+
+
+# time.time() before which no CoinGecko request should be sent, set when a
+# response reports the rate-limit window as nearly used up
+_RATE_LIMIT_RESUME_AT = 0.0
+
+
+def _note_rate_limit(headers) -> None:
+    """Record the window reset from a response whose remaining quota is below RATE_LIMIT_SAFE_THRESHOLD"""
+    global _RATE_LIMIT_RESUME_AT
+    try:
+        remaining = int(headers.get('X-RateLimit-Remaining'))
+        reset_time = int(headers.get('X-RateLimit-Reset'))
+    except (ValueError, TypeError):
+        return
+    if remaining < RATE_LIMIT_SAFE_THRESHOLD:
+        _RATE_LIMIT_RESUME_AT = max(reset_time, time.time() + 60)
+
+
+def _wait_for_rate_limit() -> None:
+    """
+    Sleep until a window recorded by _note_rate_limit has reset
+    
+    Called before a request rather than after the response that set it, so
+    the last request of a run never waits for a window nothing will use.
+    """
+    wait_time = _RATE_LIMIT_RESUME_AT - time.time()
+    if wait_time > 0:
+        print(f"    Rate limit nearly exhausted. Waiting {wait_time:.0f} seconds...")
+        time.sleep(wait_time)
+
+
 class Recommendation(Enum):
     BUY = "BUY"
     SELL = "SELL"
@@ -72,7 +249,7 @@ class Recommendation(Enum):
     DCA_OUT_ACCELERATE = "DCA_OUT_ACCELERATE"  # Accelerate DCA out
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Asset:
     symbol: str
     name: str
@@ -82,7 +259,7 @@ class Asset:
     value: float
 
 
-@dataclass
+@dataclass(slots=True)
 class TechnicalIndicatorsData:
     """Technical indicators for an asset"""
     rsi: Optional[float] = None
@@ -96,7 +273,7 @@ class TechnicalIndicatorsData:
     price_vs_bands_position: Optional[str] = None
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class MarketAnalysis:
     symbol: str
     price_change_24h: float
@@ -119,90 +296,154 @@ class MarketAnalysis:
     max_allocation_pct: Optional[float] = None  # Risk-adjusted max allocation
 
 
+@dataclass
+class PortfolioFrame:
+    """
+    Column-oriented view of a portfolio
+    
+    Holds one float64 array per Asset field, index-aligned with symbols, so
+    whole-portfolio arithmetic runs as NumPy operations instead of per-object
+    attribute access.
+    """
+    symbols: List[str]
+    names: List[str]
+    amount: "np.ndarray"
+    price: "np.ndarray"
+    allocation: "np.ndarray"
+    value: "np.ndarray"
+    
+    @classmethod
+    def from_balances(cls, balances: Dict[str, float], market_data: Dict) -> "PortfolioFrame":
+        """Build a frame from wallet balances priced with market data; unpriced symbols are skipped"""
+        symbols = [symbol for symbol in balances if symbol in market_data]
+        count = len(symbols)
+        amount = np.fromiter((balances[symbol] for symbol in symbols), dtype=np.float64, count=count)
+        price = np.fromiter(
+            (market_data[symbol]["current_price"] for symbol in symbols), dtype=np.float64, count=count
+        )
+        value = amount * price
+        total_value = value.sum()
+        # Allocation stays 0 everywhere when the portfolio has no value
+        allocation = np.divide(value * 100, total_value, out=np.zeros_like(value), where=total_value > 0)
+        return cls(
+            symbols=symbols,
+            names=[COIN_NAMES.get(symbol, symbol) for symbol in symbols],
+            amount=amount,
+            price=price,
+            allocation=allocation,
+            value=value
+        )
+    
+    def to_assets(self) -> Dict[str, Asset]:
+        """Rebuild Asset objects for code that works with the row-oriented portfolio"""
+        return {
+            symbol: Asset(
+                symbol=symbol,
+                name=name,
+                amount=amount,
+                current_price=price,
+                allocation_percent=allocation,
+                value=value
+            )
+            for symbol, name, amount, price, allocation, value in zip(
+                self.symbols, self.names, self.amount.tolist(), self.price.tolist(),
+                self.allocation.tolist(), self.value.tolist()
+            )
+        }
+
+
+# DCA recommendations whose text never varies are built once and returned
+# as-is: (recommendation, reason, action, dca_multiplier, priority)
+_DCA_MOMENTUM_BREAKOUT = (
+    Recommendation.DCA_INCREASE,
+    "Strong momentum breakout",
+    "Increase DCA to build position",
+    DCA_INCREASE_MULTIPLIER,
+    7
+)
+_DCA_BUILD_POSITION = (
+    Recommendation.DCA_STANDARD, "Building initial position", "Continue standard DCA", 1.0, 5
+)
+_DCA_BUILD_POSITION_BEARISH = (
+    Recommendation.DCA_STANDARD, "Building initial position", "Continue standard DCA", 1.0, 3
+)
+_DCA_MAINTENANCE = (
+    Recommendation.DCA_STANDARD, "Maintenance accumulation", "Continue standard DCA", 1.0, 4
+)
+
+
 class PortfolioEvaluator:
     """Evaluates cryptocurrency portfolio and provides trading recommendations"""
     
-    def __init__(self, portfolio: Dict[str, Asset]):
+    def __init__(self, portfolio: Dict[str, Asset], offline: bool = False):
         """
         Initialize evaluator with portfolio data
         
         Args:
             portfolio: Dictionary mapping asset symbols to Asset objects
+            offline: Work only from the database; historical prices are never
+                     fetched, and market data must be passed to evaluate_portfolio
         """
         self.portfolio = portfolio
+        self.offline = offline
         self.market_data = {}
-        
+        # Series fetched while analysing assets, written in one transaction
+        # once the analysis pass is done (see _flush_historical_prices)
+        self._pending_history: Dict[str, List[Tuple[str, float, None, None]]] = {}
+        # Price series loaded by calculate_technical_indicators, handed on to
+        # the risk metrics in analyze_asset instead of being re-read
+        self._price_history: Dict[str, List[Tuple[datetime, float]]] = {}
+    
     def fetch_market_data(self, symbols: List[str], retry_count: int = API_RETRY_COUNT) -> Dict:
         """
         Fetch current market data for given symbols with retry logic for rate limits
         
+        Requests go through the shared session (_http_session), so they are
+        retried by its urllib3 Retry policy and spaced by the rate-limit
+        headers. Successful responses are cached in memory and under
+        MARKET_CACHE_DIR for MARKET_DATA_CACHE_TTL seconds per symbol set, so
+        repeat runs skip the network; failures are not.
+        
         Args:
             symbols: List of asset symbols to fetch
-            retry_count: Number of retry attempts for rate limit errors
+            retry_count: Kept for compatibility; retries come from the session's Retry policy
         """
-        coin_ids = [COIN_IDS.get(symbol.upper()) for symbol in symbols 
-                   if symbol.upper() in COIN_IDS]
+        key = _market_cache_key(self._coin_ids(symbols))
+        cached = _cache_get(key)
+        if cached is not None:
+            return cached
         
-        if not coin_ids:
-            return {}
+        market_data = self._request_market_data(symbols)
         
-        # Fetch price data with 24h, 7d, 30d changes
-        url = f"{COINGECKO_BASE_URL}/coins/markets"
-        params = {
+        if market_data:
+            _cache_put(key, market_data)
+        return market_data
+    
+    @staticmethod
+    def _markets_params(coin_ids: List[str]) -> Dict:
+        """Query parameters for the /coins/markets endpoint"""
+        return {
             "vs_currency": DEFAULT_CURRENCY,
             "ids": ",".join(coin_ids),
             "order": "market_cap_desc",
             "per_page": 100,
             "page": 1,
-            "sparkline": False,
+            "sparkline": "false",
             "price_change_percentage": "24h,7d,30d"
         }
-        
-        for attempt in range(retry_count):
-            try:
-                response = requests.get(url, params=params, timeout=API_TIMEOUT)
-                
-                # Handle rate limiting (429 Too Many Requests)
-                if response.status_code == 429:
-                    # Check Retry-After header if available
-                    retry_after = response.headers.get('Retry-After')
-                    if retry_after:
-                        try:
-                            wait_time = int(retry_after)
-                        except (ValueError, TypeError):
-                            wait_time = (attempt + 1) * API_RATE_LIMIT_BACKOFF_BASE * 3
-                    else:
-                        wait_time = (attempt + 1) * API_RATE_LIMIT_BACKOFF_BASE * 3
-                    
-                    if attempt < retry_count - 1:
-                        print(f"    Rate limit hit. Waiting {wait_time} seconds before retry...")
-                        time.sleep(wait_time)
-                        continue
-                    else:
-                        print("    Error: Rate limit exceeded. Please wait a minute and try again.")
-                        return {}
-                
-                response.raise_for_status()
-                data = response.json()
-                break  # Success, exit retry loop
-                
-            except requests.exceptions.RequestException as e:
-                if attempt < retry_count - 1:
-                    wait_time = (attempt + 1) * API_RATE_LIMIT_BACKOFF_BASE
-                    print(f"    Request error: {e}. Retrying in {wait_time} seconds...")
-                    time.sleep(wait_time)
-                else:
-                    print(f"Error fetching market data after {retry_count} attempts: {e}")
-                    return {}
-        else:
-            # This shouldn't happen, but just in case
-            return {}
-        
-        # Organize data by symbol
+    
+    @staticmethod
+    def _coin_ids(symbols: List[str]) -> List[str]:
+        """CoinGecko ids for the symbols that have one"""
+        return [coin_id for coin_id in map(COIN_IDS.get, map(str.upper, symbols)) if coin_id]
+    
+    @staticmethod
+    def _organize_market_data(data: List[Dict]) -> Dict:
+        """Key a /coins/markets response by portfolio symbol"""
         market_data = {}
+        id_to_symbol = COIN_ID_TO_SYMBOL
         for coin in data:
-            symbol = next((s for s, cid in COIN_IDS.items() 
-                          if cid == coin["id"]), None)
+            symbol = id_to_symbol.get(coin["id"])
             if symbol:
                 market_data[symbol] = {
                     "current_price": coin["current_price"],
@@ -212,9 +453,95 @@ class PortfolioEvaluator:
                     "market_cap": coin.get("market_cap", 0),
                     "volume_24h": coin.get("total_volume", 0)
                 }
+        return market_data
+    
+    def _request_market_data(self, symbols: List[str]) -> Dict:
+        """
+        Fetch /coins/markets, then price any symbol it missed with one /simple/price call
         
+        Both requests use the shared session, so the fallback reuses the
+        markets request's connection.
+        """
+        requested = [symbol for symbol in map(str.upper, symbols) if symbol in COIN_IDS]
+        if not requested:
+            return {}
+        
+        # Fetch price data with 24h, 7d, 30d changes
+        url = f"{COINGECKO_BASE_URL}/coins/markets"
+        params = self._markets_params([COIN_IDS[symbol] for symbol in requested])
+        
+        data = self._get_json(url, params, "market data")
+        if data is None:
+            return {}
+        market_data = self._organize_market_data(data)
+        
+        missing = [symbol for symbol in dict.fromkeys(requested) if symbol not in market_data]
+        if missing:
+            market_data.update(self._fetch_simple_prices(missing))
         return market_data
     
+    @staticmethod
+    def _get_json(url: str, params: Dict, label: str):
+        """
+        GET a CoinGecko JSON document on the shared session
+        
+        Returns None (after printing why) when the request or decode fails.
+        """
+        try:
+            _wait_for_rate_limit()
+            response = _http_session().get(url, params=params, timeout=API_TIMEOUT)
+            _note_rate_limit(response.headers)
+            response.raise_for_status()
+            return response_json(response)
+        except requests.exceptions.RetryError:
+            print("Error: CoinGecko is rate limiting or unavailable. Please wait a minute and try again.")
+            return None
+        except (requests.exceptions.RequestException, ValueError) as e:
+            print(f"Error fetching {label}: {e}")
+            return None
+    
+    def _fetch_simple_prices(self, symbols: List[str]) -> Dict:
+        """
+        Fallback price lookup for symbols absent from the /coins/markets response
+        
+        /simple/price takes a comma-separated ids list, so every missing symbol
+        is priced by a single request. Symbols without a quote are left out.
+        """
+        coin_ids = [COIN_IDS[symbol] for symbol in symbols]
+        data = self._get_json(
+            f"{COINGECKO_BASE_URL}/simple/price", self._simple_price_params(coin_ids), "fallback prices"
+        )
+        return self._organize_simple_prices(data, symbols, coin_ids) if data else {}
+    
+    @staticmethod
+    def _simple_price_params(coin_ids: List[str]) -> Dict:
+        """Query parameters for one /simple/price request covering every coin id"""
+        return {
+            "ids": ",".join(dict.fromkeys(coin_ids)),
+            "vs_currencies": DEFAULT_CURRENCY,
+            "include_market_cap": "true",
+            "include_24hr_vol": "true",
+            "include_24hr_change": "true"
+        }
+    
+    @staticmethod
+    def _organize_simple_prices(data: Dict, symbols: List[str], coin_ids: List[str]) -> Dict:
+        """Market data entries from a /simple/price response; symbols without a quote are left out"""
+        prices = {}
+        for symbol, coin_id in zip(symbols, coin_ids):
+            quote = data.get(coin_id)
+            if not quote or DEFAULT_CURRENCY not in quote:
+                continue
+            prices[symbol] = {
+                "current_price": quote[DEFAULT_CURRENCY],
+                "price_change_24h": quote.get(f"{DEFAULT_CURRENCY}_24h_change", 0),
+                "price_change_7d": 0,
+                "price_change_30d": 0,
+                "market_cap": quote.get(f"{DEFAULT_CURRENCY}_market_cap", 0),
+                "volume_24h": quote.get(f"{DEFAULT_CURRENCY}_24h_vol", 0)
+            }
+        return prices
+    
     def fetch_historical_prices(
         self, 
         symbol: str, 
@@ -227,94 +554,54 @@ class PortfolioEvaluator:
         Args:
             symbol: Asset symbol (e.g., 'BTC')
             days: Number of days of history to fetch (max 365)
-            retry_count: Number of retry attempts
+            retry_count: Kept for compatibility; retries come from the session's Retry policy
             
         Returns:
             List of tuples (datetime, price) sorted by date (oldest first), or None on error
         """
-        if symbol.upper() not in COIN_IDS:
+        coin_id = COIN_IDS.get(symbol.upper())
+        if coin_id is None:
             return None
         
-        coin_id = COIN_IDS[symbol.upper()]
+        days = min(days, 365)  # CoinGecko max is 365 days
+        key = (coin_id, days)
+        cached = _HISTORY_CACHE.get(key)
+        if (MARKET_CACHE_ENABLED and cached is not None
+                and time.monotonic() - cached[0] < HISTORICAL_PRICES_CACHE_TTL):
+            return list(cached[1])
+        
         url = f"{COINGECKO_BASE_URL}/coins/{coin_id}/market_chart"
         params = {
             "vs_currency": DEFAULT_CURRENCY,
-            "days": min(days, 365),  # CoinGecko max is 365 days
+            "days": days,
             "interval": "daily"
         }
         
-        for attempt in range(retry_count):
-            try:
-                response = requests.get(url, params=params, timeout=API_TIMEOUT)
-                
-                # Check rate limit headers before processing response
-                rate_limit_remaining = response.headers.get('X-RateLimit-Remaining')
-                rate_limit_reset = response.headers.get('X-RateLimit-Reset')
-                
-                if rate_limit_remaining:
-                    try:
-                        remaining = int(rate_limit_remaining)
-                        if remaining < RATE_LIMIT_SAFE_THRESHOLD:
-                            if rate_limit_reset:
-                                try:
-                                    reset_time = int(rate_limit_reset)
-                                    current_time = int(time.time())
-                                    wait_time = max(reset_time - current_time, 60)
-                                    if wait_time > 0:
-                                        print(f"    Rate limit nearly exhausted ({remaining} remaining). Waiting {wait_time} seconds...")
-                                        time.sleep(wait_time)
-                                except (ValueError, TypeError):
-                                    pass
-                    except (ValueError, TypeError):
-                        pass
-                
-                if response.status_code == 429:
-                    # Check Retry-After header if available
-                    retry_after = response.headers.get('Retry-After')
-                    if retry_after:
-                        try:
-                            wait_time = int(retry_after)
-                        except (ValueError, TypeError):
-                            wait_time = (attempt + 1) * API_RATE_LIMIT_BACKOFF_BASE * 5  # Longer wait
-                    else:
-                        wait_time = (attempt + 1) * API_RATE_LIMIT_BACKOFF_BASE * 5  # Longer wait
-                    
-                    if attempt < retry_count - 1:
-                        print(f"    Rate limit hit. Waiting {wait_time} seconds before retry...")
-                        time.sleep(wait_time)
-                        continue
-                    else:
-                        print("    Error: Rate limit exceeded. Please wait a minute and try again.")
-                        return None
-                
-                response.raise_for_status()
-                data = response.json()
-                
-                # Extract prices from the response
-                # CoinGecko returns: {"prices": [[timestamp_ms, price], ...], ...}
-                prices = []
-                if "prices" in data:
-                    for entry in data["prices"]:
-                        timestamp_ms = entry[0]
-                        price = entry[1]
-                        # Convert milliseconds to datetime
-                        date_obj = datetime.fromtimestamp(timestamp_ms / 1000)
-                        prices.append((date_obj, price))
-                    
-                    # Sort by date (oldest first)
-                    prices.sort(key=lambda x: x[0])
-                    return prices
-                
-                return None
-                
-            except requests.exceptions.RequestException as e:
-                if attempt < retry_count - 1:
-                    wait_time = (attempt + 1) * API_RATE_LIMIT_BACKOFF_BASE * 3  # Longer wait
-                    print(f"    Request error: {e}. Retrying in {wait_time} seconds...")
-                    time.sleep(wait_time)
-                else:
-                    print(f"Error fetching historical prices for {symbol} after {retry_count} attempts: {e}")
-                    return None
+        try:
+            _wait_for_rate_limit()
+            response = _http_session().get(url, params=params, timeout=API_TIMEOUT)
+            _note_rate_limit(response.headers)
+            response.raise_for_status()
+            data = response_json(response)
+        except (requests.exceptions.RequestException, ValueError) as e:
+            print(f"Error fetching historical prices for {symbol}: {e}")
+            return None
+        
+        # Extract prices from the response
+        # CoinGecko returns: {"prices": [[timestamp_ms, price], ...], ...}
+        prices = []
+        if "prices" in data:
+            for entry in data["prices"]:
+                timestamp_ms = entry[0]
+                price = entry[1]
+                # Convert milliseconds to datetime
+                date_obj = datetime.fromtimestamp(timestamp_ms / 1000)
+                prices.append((date_obj, price))
+            
+            # Sort by date (oldest first)
+            prices.sort(key=lambda x: x[0])
+            _HISTORY_CACHE[key] = (time.monotonic(), prices)
+            return list(prices)
         
         return None
     
@@ -357,11 +644,106 @@ class PortfolioEvaluator:
         variance = sum((x - mean) ** 2 for x in price_changes) / len(price_changes)
         return variance ** 0.5
     
+    @staticmethod
+    def _price_changes(data: Dict) -> Tuple[float, float, float]:
+        """24h, 7d and 30d percentage changes with missing values treated as 0"""
+        return (
+            data["price_change_24h"] or 0,
+            data["price_change_7d"] or 0,
+            data["price_change_30d"] or 0
+        )
+    
+    def _momentum_metrics(
+        self, price_change_24h: float, price_change_7d: float, price_change_30d: float
+    ) -> Tuple[float, float, float]:
+        """Volatility, momentum and risk-adjusted momentum for a single asset"""
+        # Calculate volatility from price changes
+        price_changes = [abs(price_change_24h), abs(price_change_7d), abs(price_change_30d)]
+        volatility = self.calculate_volatility(price_changes)
+        
+        # Calculate raw momentum (weighted average of recent changes)
+        w_24h, w_7d, w_30d = MOMENTUM_WEIGHTS
+        momentum = (price_change_24h * w_24h + price_change_7d * w_7d + price_change_30d * w_30d)
+        
+        # Calculate risk-adjusted momentum (normalize by volatility)
+        # This makes momentum comparable across assets with different volatility levels
+        if volatility > 0:
+            risk_adjusted_momentum = momentum / volatility
+        else:
+            risk_adjusted_momentum = momentum
+        return volatility, momentum, risk_adjusted_momentum
+    
+    def calculate_momentum_metrics(self, market_data: Dict) -> Dict[str, Tuple[float, float, float]]:
+        """
+        Volatility, momentum and risk-adjusted momentum for every portfolio asset
+        
+        The 24h/7d/30d changes are stacked into an (N, 3) array so all assets are
+        handled by a few NumPy operations; without NumPy each asset is computed
+        in turn.
+        
+        Returns:
+            Dictionary mapping symbol to (volatility, momentum, risk_adjusted_momentum)
+        """
+        symbols = [symbol for symbol in self.portfolio if symbol in market_data]
+        if not symbols:
+            return {}
+        
+        if not NUMPY_AVAILABLE:
+            return {
+                symbol: self._momentum_metrics(*self._price_changes(market_data[symbol]))
+                for symbol in symbols
+            }
+        
+        changes = np.array(
+            [self._price_changes(market_data[symbol]) for symbol in symbols], dtype=np.float64
+        )
+        weights = np.array(MOMENTUM_WEIGHTS)
+        
+        volatility = np.abs(changes).std(axis=1)
+        momentum = changes @ weights
+        risk_adjusted = np.divide(momentum, volatility, out=momentum.copy(), where=volatility > 0)
+        
+        return {
+            symbol: metrics
+            for symbol, metrics in zip(
+                symbols, zip(volatility.tolist(), momentum.tolist(), risk_adjusted.tolist())
+            )
+        }
+    
+    @staticmethod
+    def _trend(risk_adjusted_momentum: float) -> str:
+        """Trend from risk-adjusted momentum, with thresholds in standard deviations"""
+        if risk_adjusted_momentum > 1.0:  # More than 1 std dev above mean
+            return "bullish"
+        if risk_adjusted_momentum < -1.0:  # More than 1 std dev below mean
+            return "bearish"
+        return "neutral"
+    
+    def classify_trends(self, momentum_metrics: Dict[str, Tuple[float, float, float]]) -> Dict[str, str]:
+        """
+        Trend for every asset in the output of calculate_momentum_metrics
+        
+        Returns:
+            Dictionary mapping symbol to "bullish", "bearish" or "neutral"
+        """
+        if not NUMPY_AVAILABLE or not momentum_metrics:
+            return {symbol: self._trend(metrics[2]) for symbol, metrics in momentum_metrics.items()}
+        
+        risk_adjusted = np.fromiter(
+            (metrics[2] for metrics in momentum_metrics.values()),
+            dtype=np.float64, count=len(momentum_metrics)
+        )
+        trends = np.where(
+            risk_adjusted > 1.0, "bullish", np.where(risk_adjusted < -1.0, "bearish", "neutral")
+        )
+        return dict(zip(momentum_metrics, trends.tolist()))
+    
     def calculate_technical_indicators(
         self, 
         symbol: str, 
         current_price: float,
-        market_data: Dict
+        market_data: Dict,
+        allow_fetch: bool = True
     ) -> Optional[TechnicalIndicatorsData]:
         """
         Calculate technical indicators for an asset using historical price data
@@ -370,22 +752,22 @@ class PortfolioEvaluator:
             symbol: Asset symbol
             current_price: Current price of the asset
             market_data: Market data dictionary
+            allow_fetch: If False, use stored prices only, as in offline mode
             
         Returns:
             TechnicalIndicatorsData object or None if insufficient data
         """
-        try:
-            from technical_indicators import TechnicalIndicators
-        except ImportError:
+        if not TECH_INDICATORS_AVAILABLE:
             return None
+        offline = self.offline or not allow_fetch
         
         # Try to get historical prices from database first
         historical_prices = None
+        stored_prices = None
+        stale_prices = None
         if DATABASE_AVAILABLE:
             try:
-                db = PortfolioDatabase()
-                historical_prices = db.get_historical_prices(symbol, days=200)
-                db.close()
+                historical_prices = stored_prices = _thread_db().get_historical_prices(symbol, days=200)
                 
                 # Check if we have enough data and if it's recent
                 if historical_prices:
@@ -393,29 +775,43 @@ class PortfolioEvaluator:
                     days_old = (datetime.now() - latest_date).days if latest_date else 999
                     
                     # If data is more than 2 days old, fetch fresh data
-                    if days_old > 2 or len(historical_prices) < 50:
+                    # (offline runs make do with what is stored)
+                    if (days_old > 2 or len(historical_prices) < 50) and not offline:
+                        # A long enough but old series only needs the missing days
+                        if len(historical_prices) >= 50:
+                            stale_prices = historical_prices
                         historical_prices = None
             except sqlite3.Error:
                 # If database fails, fall back to API
                 historical_prices = None
         
-        # Fetch from API if database doesn't have recent data
-        if not historical_prices or len(historical_prices) < 50:
-            historical_prices = self.fetch_historical_prices(symbol, days=200)
-            
-            # Save to database if we got data
-            if historical_prices and DATABASE_AVAILABLE:
-                try:
-                    db = PortfolioDatabase()
-                    # Convert to format for database storage
-                    price_data = [
-                        (date.strftime("%Y-%m-%d"), price, None, None)
-                        for date, price in historical_prices
-                    ]
-                    db.save_historical_prices(symbol, price_data)
-                    db.close()
-                except Exception:
-                    pass  # Don't fail if database save fails
+        new_prices = None
+        if stale_prices is not None:
+            # Top up the stored series instead of refetching all 200 days
+            latest_date = stale_prices[-1][0]
+            new_prices = self.fetch_missing_historical_prices(symbol, latest_date)
+            if new_prices:
+                new_prices = [
+                    (date, price) for date, price in new_prices
+                    if date.date() > latest_date.date()
+                ]
+                historical_prices = stale_prices + new_prices
+        elif (not historical_prices or len(historical_prices) < 50) and not offline:
+            # Fetch from API if database doesn't have usable data
+            historical_prices = new_prices = self.fetch_historical_prices(symbol, days=200)
+        
+        # Queue the new points for the database; evaluate_portfolio saves the
+        # whole pass at once
+        if new_prices and DATABASE_AVAILABLE:
+            self._pending_history[symbol] = [
+                (date.strftime("%Y-%m-%d"), price, None, None)
+                for date, price in new_prices
+            ]
+        
+        # The stored rows are what the database would return to the risk
+        # metrics if nothing new was fetched
+        if historical_prices or stored_prices:
+            self._price_history[symbol] = historical_prices or stored_prices
         
         if not historical_prices or len(historical_prices) < 14:
             # Not enough data for indicators
@@ -428,20 +824,10 @@ class PortfolioEvaluator:
         if len(prices) == 0 or prices[-1] != current_price:
             prices.append(current_price)
         
-        # Calculate indicators
-        rsi = TechnicalIndicators.calculate_rsi(prices, period=14)
-        sma_50 = TechnicalIndicators.calculate_sma(prices, period=50) if len(prices) >= 50 else None
-        sma_200 = TechnicalIndicators.calculate_sma(prices, period=200) if len(prices) >= 200 else None
-        ema_12 = TechnicalIndicators.calculate_ema(prices, period=12) if len(prices) >= 12 else None
-        ema_26 = TechnicalIndicators.calculate_ema(prices, period=26) if len(prices) >= 26 else None
-        
-        # Calculate MACD with proper history
-        macd = None
-        if len(prices) >= 26:
-            macd = TechnicalIndicators.calculate_macd_with_history(prices)
-        
-        # Calculate Bollinger Bands
-        bollinger_bands = TechnicalIndicators.calculate_bollinger_bands(prices, period=20) if len(prices) >= 20 else None
+        # Calculate indicators (shared EMA series feed EMA-12/26 and MACD)
+        indicators = TechnicalIndicators.calculate_all(prices)
+        sma_200 = indicators['sma_200']
+        bollinger_bands = indicators['bollinger_bands']
         
         # Determine price position relative to moving averages
         price_vs_ma_position = None
@@ -460,12 +846,12 @@ class PortfolioEvaluator:
         )
         
         return TechnicalIndicatorsData(
-            rsi=rsi,
-            sma_50=sma_50,
+            rsi=indicators['rsi'],
+            sma_50=indicators['sma_50'],
             sma_200=sma_200,
-            ema_12=ema_12,
-            ema_26=ema_26,
-            macd=macd,
+            ema_12=indicators['ema_12'],
+            ema_26=indicators['ema_26'],
+            macd=indicators['macd'],
             bollinger_bands=bollinger_bands,
             price_vs_ma_position=price_vs_ma_position,
             price_vs_bands_position=price_vs_bands_position
@@ -503,28 +889,36 @@ class PortfolioEvaluator:
         # 3. Default behavior based on allocation
         return self._check_allocation_strategy(asset, trend)
 
+    @staticmethod
+    def _strict_cap(symbol: str) -> float:
+        """Allocation percentage above which DCA into the asset stops"""
+        return 45.0 if symbol in ('BTC', 'ETH') else 20.0
+    
     def _check_risk_factors(self, asset, volatility, trend, risk_adjusted_momentum, technical_indicators) -> Optional[Tuple]:
         """Check for conditions that suggest stopping or reducing DCA"""
-        strict_cap = 45.0 if asset.symbol in ['BTC', 'ETH'] else 20.0
+        # Read once into locals; every rule below compares against them
+        allocation = asset.allocation_percent
+        rsi = technical_indicators.rsi if technical_indicators else None
+        strict_cap = self._strict_cap(asset.symbol)
         
         # Stop DCA if over-allocated significantly
-        if asset.allocation_percent > strict_cap:
+        if allocation > strict_cap:
              # Stop DCA if over-allocated significantly
-            if asset.allocation_percent > strict_cap * 1.2: # Way over cap
+            if allocation > strict_cap * 1.2: # Way over cap
                  sell_amount = asset.value * 0.05
                  return (
                     Recommendation.DCA_OUT_START,
-                    f"Critical over-allocation ({asset.allocation_percent:.1f}%). Portfolio balance risk is high.",
+                    f"Critical over-allocation ({allocation:.1f}%). Portfolio balance risk is high.",
                     f"Sell ${sell_amount:.2f} (Risk Reduction)",
                     0.0,
                     9
                 )
             
             # Allow average down if extreme crash
-            if technical_indicators and technical_indicators.rsi is not None and technical_indicators.rsi < RSI_EXTREME_OVERSOLD:
+            if rsi is not None and rsi < RSI_EXTREME_OVERSOLD:
                 return (
                     Recommendation.DCA_INCREASE,
-                    f"Asset is strictly over-allocated ({asset.allocation_percent:.1f}%) but RSI is extremely oversold - averaging down.",
+                    f"Asset is strictly over-allocated ({allocation:.1f}%) but RSI is extremely oversold - averaging down.",
                     "Buy (0.5x - Averaging Down)",
                     0.5,
                     8
@@ -532,37 +926,37 @@ class PortfolioEvaluator:
             
             return (
                 Recommendation.DCA_PAUSE,
-                f"Allocation ({asset.allocation_percent:.1f}%) exceeds strict cap ({strict_cap}%)",
+                f"Allocation ({allocation:.1f}%) exceeds strict cap ({strict_cap}%)",
                 "Pause DCA to prevent further over-exposure",
                 0.0,
                 0
             )
             
         # Stop DCA if in extreme overbought territory
-        if technical_indicators and technical_indicators.rsi is not None:
-             if technical_indicators.rsi > RSI_EXTREME_OVERBOUGHT:
-                if asset.allocation_percent > 10:
+        if rsi is not None:
+             if rsi > RSI_EXTREME_OVERBOUGHT:
+                if allocation > 10:
                     sell_amount = asset.value * 0.1
                     return (
                         Recommendation.DCA_OUT_START,
-                        f"Extremely overbought (RSI: {technical_indicators.rsi:.1f}) - profit taking opportunity",
+                        f"Extremely overbought (RSI: {rsi:.1f}) - profit taking opportunity",
                         f"Sell ${sell_amount:.2f}",
                         0.0,
                         8
                     )
                 return (
                     Recommendation.DCA_PAUSE,
-                    f"Extreme overbought conditions (RSI: {technical_indicators.rsi:.1f})",
+                    f"Extreme overbought conditions (RSI: {rsi:.1f})",
                     "Pause DCA and wait for pullback",
                     0.0,
                     0
                 )
         
         # Reduce DCA if allocation is getting high
-        if asset.allocation_percent > strict_cap * 0.8:
+        if allocation > strict_cap * 0.8:
              return (
                 Recommendation.DCA_DECREASE,
-                f"Approaching maximum allocation ({asset.allocation_percent:.1f}%)",
+                f"Approaching maximum allocation ({allocation:.1f}%)",
                 "Reduce DCA amount by 50%",
                 DCA_DECREASE_MULTIPLIER,
                 3
@@ -583,6 +977,8 @@ class PortfolioEvaluator:
     def _check_buy_signals(self, asset, change_24h, change_30d, risk_adjusted_momentum, technical_indicators) -> Optional[Tuple]:
         """Check for opportunities to increase DCA"""
         
+        rsi = technical_indicators.rsi if technical_indicators else None
+        
         # Increase DCA on strong dips (buy the dip)
         if change_24h < STRONG_PRICE_DROP_THRESHOLD and risk_adjusted_momentum > -1.0:
             multiplier = DCA_INCREASE_MULTIPLIER
@@ -590,15 +986,15 @@ class PortfolioEvaluator:
             reason = ""
             
             # Supercharge if RSI is oversold
-            if technical_indicators and technical_indicators.rsi:
-                if technical_indicators.rsi < RSI_EXTREME_OVERSOLD:
+            if rsi:
+                if rsi < RSI_EXTREME_OVERSOLD:
                     multiplier = 2.0
                     priority = 10
-                    reason = f"Extreme oversold (RSI: {technical_indicators.rsi:.1f}) + Dip"
-                elif technical_indicators.rsi < RSI_OVERSOLD:
+                    reason = f"Extreme oversold (RSI: {rsi:.1f}) + Dip"
+                elif rsi < RSI_OVERSOLD:
                     multiplier = 1.5
                     priority = 9
-                    reason = f"Oversold (RSI: {technical_indicators.rsi:.1f}) + Dip"
+                    reason = f"Oversold (RSI: {rsi:.1f}) + Dip"
             
             if not reason:
                  reason = f"Buying the dip ({change_24h:.1f}%)"
@@ -613,13 +1009,7 @@ class PortfolioEvaluator:
             
         # Increase DCA on momentum breakout if under-allocated
         if risk_adjusted_momentum > STRONG_MOMENTUM_THRESHOLD and asset.allocation_percent < 10:
-             return (
-                Recommendation.DCA_INCREASE,
-                "Strong momentum breakout",
-                "Increase DCA to build position",
-                DCA_INCREASE_MULTIPLIER,
-                7
-            )
+            return _DCA_MOMENTUM_BREAKOUT
             
         return None
 
@@ -627,45 +1017,34 @@ class PortfolioEvaluator:
         """Default DCA strategy based on allocation status"""
         if asset.allocation_percent < 5:
             # Boost priority for small bags if trend is okay
-            priority = 5 if trend != 'bearish' else 3
-            return (
-                Recommendation.DCA_STANDARD,
-                "Building initial position",
-                "Continue standard DCA",
-                1.0,
-                priority
-            )
-        else:
-            return (
-                Recommendation.DCA_STANDARD,
-                "Maintenance accumulation",
-                "Continue standard DCA",
-                1.0,
-                4
-            )
+            return _DCA_BUILD_POSITION_BEARISH if trend == 'bearish' else _DCA_BUILD_POSITION
+        return _DCA_MAINTENANCE
 
     def generate_executive_summary(self, analyses: List[MarketAnalysis]) -> Dict[str, str]:
         """Generate a high-level executive summary of the portfolio actions."""
         
-        # Count actions
-        dca_buy_count = sum(1 for a in analyses if "Buy" in a.suggested_action)
-        dca_sell_count = sum(1 for a in analyses if "Sell" in a.suggested_action)
-        dca_pause_count = sum(1 for a in analyses if "Pause" in a.suggested_action)
-        
-        # Calculate total buy/sell amounts
+        # Partition actions and total the dollar amounts in one pass
+        buy_analyses = []
+        sell_analyses = []
+        dca_pause_count = 0
         total_buy_amount = 0.0
         total_sell_amount = 0.0
         
         for a in analyses:
+            action = a.suggested_action
+            if "Buy" in action:
+                buy_analyses.append(a)
+            if "Sell" in action:
+                sell_analyses.append(a)
+            if "Pause" in action:
+                dca_pause_count += 1
             # Extract dollar amount from string "Buy $150.00 ..."
             try:
-                if "Buy $" in a.suggested_action:
-                    amount_part = a.suggested_action.split("Buy $")[1].split(" ")[0]
-                    total_buy_amount += float(amount_part)
-                elif "Sell $" in a.suggested_action:
-                    amount_part = a.suggested_action.split("Sell $")[1].split(" ")[0]
-                    total_sell_amount += float(amount_part)
-            except:
+                if "Buy $" in action:
+                    total_buy_amount += float(action.split("Buy $")[1].split(" ")[0])
+                elif "Sell $" in action:
+                    total_sell_amount += float(action.split("Sell $")[1].split(" ")[0])
+            except (IndexError, ValueError):
                 pass
         
         title = "AI Portfolio Strategy"
@@ -674,12 +1053,12 @@ class PortfolioEvaluator:
             summary_text = f"🚨 **Risk Reduction Mode**: Your portfolio is showing signs of over-extension. " \
                            f"I've identified ${total_sell_amount:.2f} in potential profit-taking or risk-reduction sales. " \
                            f"Focus on trimming overweight positions like " \
-                           f"{', '.join([a.symbol for a in analyses if 'Sell' in a.suggested_action][:2])}."
+                           f"{', '.join([a.symbol for a in sell_analyses[:2]])}."
             mood = "cautious"
         elif total_buy_amount > 500: # Arbitrary high threshold
             summary_text = f"🚀 **Accumulation Opportunity**: Market conditions are favorable for aggressive DCA. " \
                            f"I recommend deploying ${total_buy_amount:.2f} across under-valued assets. " \
-                           f"Key buy targets: {', '.join([a.symbol for a in analyses if 'Buy' in a.suggested_action and a.dca_priority > 7][:2])}."
+                           f"Key buy targets: {', '.join([a.symbol for a in buy_analyses if a.dca_priority > 7][:2])}."
             mood = "bullish"
         elif dca_pause_count > len(analyses) / 2:
             summary_text = f"🛡️ **Defensive Posture**: Uncertainty is high. I recommend pausing DCA for {dca_pause_count} assets " \
@@ -698,8 +1077,23 @@ class PortfolioEvaluator:
             "total_sell": total_sell_amount
         }
     
-    def analyze_asset(self, asset: Asset, market_data: Dict) -> MarketAnalysis:
-        """Analyze individual asset and generate recommendation"""
+    def analyze_asset(
+        self,
+        asset: Asset,
+        market_data: Dict,
+        metrics: Optional[Tuple[float, float, float]] = None,
+        trend: Optional[str] = None
+    ) -> MarketAnalysis:
+        """
+        Analyze individual asset and generate recommendation
+        
+        Args:
+            asset: Asset to analyze
+            market_data: Market data keyed by symbol
+            metrics: Precomputed (volatility, momentum, risk_adjusted_momentum),
+                     as returned by calculate_momentum_metrics
+            trend: Precomputed trend, as returned by classify_trends
+        """
         symbol = asset.symbol
         
         if symbol not in market_data:
@@ -723,38 +1117,25 @@ class PortfolioEvaluator:
                 max_allocation_pct=None
             )
         
-        data = market_data[symbol]
-        price_change_24h = data["price_change_24h"] or 0
-        price_change_7d = data["price_change_7d"] or 0
-        price_change_30d = data["price_change_30d"] or 0
-        
-        # Calculate volatility from price changes
-        price_changes = [abs(price_change_24h), abs(price_change_7d), abs(price_change_30d)]
-        volatility = self.calculate_volatility(price_changes)
-        
-        # Calculate raw momentum (weighted average of recent changes)
-        momentum = (price_change_24h * 0.5 + price_change_7d * 0.3 + price_change_30d * 0.2)
-        
-        # Calculate risk-adjusted momentum (normalize by volatility)
-        # This makes momentum comparable across assets with different volatility levels
-        if volatility > 0:
-            risk_adjusted_momentum = momentum / volatility
-        else:
-            risk_adjusted_momentum = momentum if momentum != 0 else 0
+        price_change_24h, price_change_7d, price_change_30d = self._price_changes(market_data[symbol])
+        if metrics is None:
+            metrics = self._momentum_metrics(price_change_24h, price_change_7d, price_change_30d)
+        volatility, momentum, risk_adjusted_momentum = metrics
         
         # Determine trend using risk-adjusted momentum
         # Thresholds are now in terms of standard deviations (more statistically meaningful)
-        if risk_adjusted_momentum > 1.0:  # More than 1 std dev above mean
-            trend = "bullish"
-        elif risk_adjusted_momentum < -1.0:  # More than 1 std dev below mean
-            trend = "bearish"
-        else:
-            trend = "neutral"
+        if trend is None:
+            trend = self._trend(risk_adjusted_momentum)
         
-        # Calculate technical indicators (if historical data available)
+        # Calculate technical indicators (if historical data available). Far
+        # above its strict cap an asset gets DCA_OUT_START whatever the
+        # indicators say, so it is not worth an API fetch; stored prices are
+        # still used for the report.
         technical_indicators = self.calculate_technical_indicators(
-            symbol, asset.current_price, market_data
+            symbol, asset.current_price, market_data,
+            allow_fetch=asset.allocation_percent <= self._strict_cap(symbol) * 1.2
         )
+        price_history = self._price_history.pop(symbol, None)
         
         # Generate DCA-based recommendation
         recommendation, reason, action, dca_multiplier, priority = self._generate_dca_recommendation(
@@ -770,13 +1151,13 @@ class PortfolioEvaluator:
         try:
             from risk_management import RiskManager, RiskTolerance
             
-            # Get historical prices
+            # Get historical prices, preferring the series the indicators used
             historical_prices = None
-            if DATABASE_AVAILABLE:
+            if price_history:
+                historical_prices = [price for _, price in price_history]
+            elif DATABASE_AVAILABLE:
                 try:
-                    db = PortfolioDatabase()
-                    historical_prices_data = db.get_historical_prices(symbol, days=200)
-                    db.close()
+                    historical_prices_data = _thread_db().get_historical_prices(symbol, days=200)
                     if historical_prices_data:
                         historical_prices = [price for _, price in historical_prices_data]
                 except Exception:
@@ -846,94 +1227,6 @@ class PortfolioEvaluator:
             max_allocation_pct=max_allocation_pct
         )
     
-    def _generate_recommendation(
-        self, asset: Asset, change_24h: float, change_7d: float, 
-        change_30d: float, momentum: float, risk_adjusted_momentum: float, 
-        volatility: float, trend: str
-    ) -> Tuple[Recommendation, str, str]:
-        """Generate buy/sell/hold recommendation with reasoning"""
-        
-        reasons = []
-        action_parts = []
-        
-        # Factor 1: Over-allocation check
-        if asset.allocation_percent > OVER_ALLOCATION_THRESHOLD:
-            reasons.append(f"Over-allocated at {asset.allocation_percent:.2f}%")
-            # Use risk-adjusted momentum for more accurate signal detection
-            if trend == "bearish" or risk_adjusted_momentum < MODERATE_BEARISH_THRESHOLD:
-                return (
-                    Recommendation.SELL,
-                    f"Over-allocated ({asset.allocation_percent:.2f}%) and showing bearish signals",
-                    f"Consider selling {min(10, asset.allocation_percent - 35):.1f}% to rebalance"
-                )
-        
-        # Factor 2: Strong bearish momentum (using risk-adjusted)
-        # BEARISH_MOMENTUM_THRESHOLD means 2 standard deviations below mean - very significant
-        if risk_adjusted_momentum < BEARISH_MOMENTUM_THRESHOLD and change_24h < STRONG_PRICE_DROP_THRESHOLD:
-            reasons.append("Strong bearish momentum detected")
-            if asset.allocation_percent > 20:
-                return (
-                    Recommendation.SELL,
-                    "Strong bearish momentum with significant recent decline",
-                    f"Consider selling 10-20% to reduce exposure"
-                )
-        
-        # Factor 3: Strong bullish momentum with low allocation (using risk-adjusted)
-        # STRONG_MOMENTUM_THRESHOLD means 2 standard deviations above mean - very significant
-        if risk_adjusted_momentum > STRONG_MOMENTUM_THRESHOLD and asset.allocation_percent < 10:
-            reasons.append("Strong bullish momentum with low allocation")
-            return (
-                Recommendation.BUY,
-                "Strong bullish momentum and under-allocated position",
-                f"Consider increasing allocation to 10-15%"
-            )
-        
-        # Factor 4: High volatility with over-allocation
-        if volatility > HIGH_VOLATILITY_THRESHOLD and asset.allocation_percent > 30:
-            reasons.append(f"High volatility ({volatility:.1f}%) with large position")
-            if trend == "bearish":
-                return (
-                    Recommendation.SELL,
-                    "High volatility combined with bearish trend",
-                    "Consider reducing position by 5-10% to manage risk"
-                )
-        
-        # Factor 5: Consistent positive momentum
-        if change_7d > 10 and change_30d > 20 and asset.allocation_percent < 15:
-            reasons.append("Consistent strong performance")
-            return (
-                Recommendation.BUY,
-                "Consistent strong performance over multiple timeframes",
-                "Consider adding to position if it fits your risk profile"
-            )
-        
-        # Factor 6: Under-allocation with neutral/positive trend
-        if asset.allocation_percent < 5 and trend != "bearish":
-            reasons.append("Under-allocated with positive/neutral trend")
-            return (
-                Recommendation.BUY,
-                "Under-allocated position with neutral or positive trend",
-                "Consider increasing to 5-10% for better diversification"
-            )
-        
-        # Factor 7: Rebalancing opportunity (moderate allocation, strong performance)
-        if 10 <= asset.allocation_percent <= 30:
-            if change_30d > 25:
-                reasons.append("Strong 30-day performance suggests taking profits")
-                return (
-                    Recommendation.SELL,
-                    "Strong 30-day gains suggest taking some profits",
-                    "Consider selling 5-10% to lock in gains"
-                )
-        
-        # Default: Hold
-        reason_text = "; ".join(reasons) if reasons else "No strong signals detected"
-        return (
-            Recommendation.HOLD,
-            reason_text or "Portfolio allocation and market conditions are balanced",
-            "Maintain current position"
-        )
-    
     def ensure_historical_prices(self, symbols: List[str], force_refresh: bool = False, max_fetches: Optional[int] = None):
         """
         Ensure historical prices are available in database for all symbols
@@ -950,7 +1243,7 @@ class PortfolioEvaluator:
             max_fetches = MAX_HISTORICAL_FETCHES_PER_RUN
         
         try:
-            db = PortfolioDatabase()
+            db = _thread_db()
             symbols_to_fetch = []
             symbols_with_dates = {}  # Store latest dates for incremental updates
             
@@ -973,8 +1266,6 @@ class PortfolioEvaluator:
                             symbols_to_fetch.append(symbol)
                             symbols_with_dates[symbol] = latest_date
             
-            db.close()
-            
             # Limit number of fetches per run to avoid rate limits
             if len(symbols_to_fetch) > max_fetches:
                 print(f"  Limiting to {max_fetches} fetches this run to avoid rate limits.")
@@ -986,13 +1277,18 @@ class PortfolioEvaluator:
                 print(f"Fetching historical price data for {len(symbols_to_fetch)} assets...")
                 print("(Adding delays between requests to respect rate limits)")
                 
+                # Requests start HISTORICAL_PRICE_FETCH_DELAY seconds apart; time
+                # spent on the previous request and its database save counts
+                # towards the gap
+                last_request = None
                 for i, symbol in enumerate(symbols_to_fetch):
                     try:
-                        # Add delay between requests (except for first one)
-                        if i > 0:
-                            delay = HISTORICAL_PRICE_FETCH_DELAY
-                            print(f"  Waiting {delay} seconds before next request...")
-                            time.sleep(delay)
+                        if last_request is not None:
+                            delay = HISTORICAL_PRICE_FETCH_DELAY - (time.monotonic() - last_request)
+                            if delay > 0:
+                                print(f"  Waiting {delay:.1f} seconds before next request...")
+                                time.sleep(delay)
+                        last_request = time.monotonic()
                         
                         # Use incremental update if we have existing data
                         latest_date = symbols_with_dates.get(symbol)
@@ -1002,13 +1298,11 @@ class PortfolioEvaluator:
                             historical_prices = self.fetch_historical_prices(symbol, days=200)
                         
                         if historical_prices:
-                            db = PortfolioDatabase()
                             price_data = [
                                 (date.strftime("%Y-%m-%d"), price, None, None)
                                 for date, price in historical_prices
                             ]
                             db.save_historical_prices(symbol, price_data)
-                            db.close()
                             print(f"  ✓ {symbol}: {len(historical_prices)} days of price data")
                         else:
                             print(f"  ✗ {symbol}: Failed to fetch historical prices")
@@ -1027,234 +1321,284 @@ class PortfolioEvaluator:
                             if i < len(symbols_to_fetch) - 1:
                                 print(f"  Remaining {len(symbols_to_fetch) - i - 1} symbols will be fetched on next run.")
                             break
+        except sqlite3.Error as e:
+            print(f"Warning: Could not read or save historical prices: {e}")
         except Exception as e:
             print(f"Warning: Could not ensure historical prices: {e}")
     
-    def evaluate_portfolio(self, market_data: Optional[Dict] = None) -> List[MarketAnalysis]:
+    def evaluate_portfolio(
+        self,
+        market_data: Optional[Dict] = None,
+        extra_symbols: Optional[List[str]] = None
+    ) -> List[MarketAnalysis]:
         """
         Evaluate entire portfolio and return recommendations
         
         Args:
             market_data: Optional pre-fetched market data. If None, will fetch it.
+            extra_symbols: Symbols outside the portfolio to price in the same
+                           request (e.g. rebalancing targets). Ignored when
+                           market_data is provided.
         """
         symbols = list(self.portfolio.keys())
         
         # Use provided market_data or fetch it
         if market_data is None:
             print(f"Fetching market data for {len(symbols)} assets...")
-            market_data = self.fetch_market_data(symbols)
+            fetch_symbols = symbols + [s for s in (extra_symbols or ()) if s not in self.portfolio]
+            market_data = self.fetch_market_data(fetch_symbols)
             
             if not market_data:
                 print("Warning: Could not fetch market data. Using placeholder data.")
                 return []
+        elif self.offline:
+            print(f"Loaded market data for {len(market_data)} assets from the saved snapshot")
         else:
             print(f"Using pre-fetched market data for {len(symbols)} assets...")
         
         # Store market_data for use in rebalancing calculations
         self.market_data = market_data
         
-        print(f"Successfully fetched data for {len(market_data)} assets")
+        if not self.offline:
+            print(f"Successfully fetched data for {len(market_data)} assets")
         
         # Ensure historical prices are available for technical indicators
         # This will check database first and only fetch if needed
-        self.ensure_historical_prices(symbols, force_refresh=False)
+        if not self.offline:
+            self.ensure_historical_prices(symbols, force_refresh=False)
         print()
         
-        analyses = []
-        for symbol, asset in self.portfolio.items():
-            analysis = self.analyze_asset(asset, market_data)
-            analyses.append(analysis)
+        momentum_metrics = self.calculate_momentum_metrics(market_data)
+        trends = self.classify_trends(momentum_metrics)
         
-        return analyses
+        try:
+            return [
+                self.analyze_asset(asset, market_data, momentum_metrics.get(symbol), trends.get(symbol))
+                for symbol, asset in self.portfolio.items()
+            ]
+        finally:
+            self._flush_historical_prices()
     
-    def _print_recommendation_section(
+    def _flush_historical_prices(self):
+        """Save the price series queued by calculate_technical_indicators in one transaction"""
+        if not self._pending_history:
+            return
+        pending, self._pending_history = self._pending_history, {}
+        try:
+            _thread_db().save_historical_prices_bulk(pending)
+        except sqlite3.Error as e:
+            # Don't fail the analysis, but say the series will be refetched
+            print(f"Warning: Could not save historical prices for {', '.join(pending)}: {e}")
+    
+    def _format_recommendation_section(
         self, 
         action_type: str, 
         section_title: str, 
         analyses: List[MarketAnalysis],
         show_action: bool = True
-    ):
-        """Helper method to print a section of recommendations"""
-        print(f"[{action_type}] {section_title}")
-        print("-" * 80)
+    ) -> List[str]:
+        """Helper method to format a section of recommendations as report lines"""
+        lines = [f"[{action_type}] {section_title}", "-" * 80]
         for analysis in analyses:
-            asset = self.portfolio[analysis.symbol]
-            print(f"\n{asset.name} ({analysis.symbol})")
-            print(f"  Current Allocation: {asset.allocation_percent:.2f}%")
-            print(f"  Current Value: AU${asset.value:,.2f}")
-            print(f"  24h Change: {analysis.price_change_24h:+.2f}%")
-            print(f"  7d Change: {analysis.price_change_7d:+.2f}%")
-            print(f"  30d Change: {analysis.price_change_30d:+.2f}%")
-            print(f"  Momentum: {analysis.momentum:+.2f}%")
-            print(f"  Risk-Adjusted Momentum: {analysis.risk_adjusted_momentum:+.2f} std dev")
-            print(f"  Trend: {analysis.trend.upper()}")
-            
-            # Show technical indicators if available
-            if analysis.technical_indicators:
-                ti = analysis.technical_indicators
-                if ti.rsi is not None:
-                    rsi_status = ""
-                    if ti.rsi < 30:
-                        rsi_status = " (Oversold)"
-                    elif ti.rsi > 70:
-                        rsi_status = " (Overbought)"
-                    print(f"  RSI: {ti.rsi:.1f}{rsi_status}")
-                
-                if ti.sma_50 is not None:
-                    print(f"  50-day SMA: AU${ti.sma_50:,.2f}")
-                
-                if ti.sma_200 is not None:
-                    print(f"  200-day SMA: AU${ti.sma_200:,.2f}")
-                    if asset.current_price > 0:
-                        ma_distance = ((asset.current_price - ti.sma_200) / ti.sma_200) * 100
-                        print(f"  Price vs 200-day MA: {ma_distance:+.1f}%")
-                
-                if ti.macd is not None:
-                    macd = ti.macd
-                    macd_signal = "Bullish" if macd['histogram'] > 0 else "Bearish"
-                    print(f"  MACD: {macd['macd']:.2f} | Signal: {macd['signal']:.2f} | Histogram: {macd['histogram']:.2f} ({macd_signal})")
-                
-                if ti.bollinger_bands is not None:
-                    bb = ti.bollinger_bands
-                    if ti.price_vs_bands_position:
-                        position_map = {
-                            'above_upper': 'Above Upper Band',
-                            'upper_half': 'Upper Half',
-                            'lower_half': 'Lower Half',
-                            'below_lower': 'Below Lower Band'
-                        }
-                        position_str = position_map.get(ti.price_vs_bands_position, ti.price_vs_bands_position)
-                        print(f"  Bollinger Bands: {position_str} (Upper: AU${bb['upper']:,.2f}, Lower: AU${bb['lower']:,.2f})")
+            lines.extend(self._format_asset_block(self.portfolio[analysis.symbol], analysis, show_action))
+        lines.append("")
+        return lines
+    
+    def _format_asset_block(self, asset: Asset, analysis: MarketAnalysis, show_action: bool = True) -> List[str]:
+        """Report lines describing one asset and its recommendation"""
+        lines = [f"\n{asset.name} ({analysis.symbol})"]
+        lines.append(f"  Current Allocation: {asset.allocation_percent:.2f}%")
+        lines.append(f"  Current Value: AU${asset.value:,.2f}")
+        lines.append(f"  24h Change: {analysis.price_change_24h:+.2f}%")
+        lines.append(f"  7d Change: {analysis.price_change_7d:+.2f}%")
+        lines.append(f"  30d Change: {analysis.price_change_30d:+.2f}%")
+        lines.append(f"  Momentum: {analysis.momentum:+.2f}%")
+        lines.append(f"  Risk-Adjusted Momentum: {analysis.risk_adjusted_momentum:+.2f} std dev")
+        lines.append(f"  Trend: {analysis.trend.upper()}")
+        
+        # Show technical indicators if available
+        if analysis.technical_indicators:
+            ti = analysis.technical_indicators
+            if ti.rsi is not None:
+                rsi_status = ""
+                if ti.rsi < 30:
+                    rsi_status = " (Oversold)"
+                elif ti.rsi > 70:
+                    rsi_status = " (Overbought)"
+                lines.append(f"  RSI: {ti.rsi:.1f}{rsi_status}")
             
-            # Show DCA information for DCA recommendations
-            if analysis.recommendation in [
-                Recommendation.DCA_INCREASE, 
-                Recommendation.DCA_STANDARD, 
-                Recommendation.DCA_DECREASE,
-                Recommendation.DCA_PAUSE,
-                Recommendation.DCA_OUT_START,
-                Recommendation.DCA_OUT_ACCELERATE
-            ]:
-                print(f"  DCA Multiplier: {analysis.dca_multiplier:.2f}x")
-                print(f"  DCA Priority: {analysis.dca_priority}/10")
+            if ti.sma_50 is not None:
+                lines.append(f"  50-day SMA: AU${ti.sma_50:,.2f}")
             
-            # Show risk metrics if available
-            if analysis.risk_metrics:
-                rm = analysis.risk_metrics
-                print(f"  Risk Score: {rm.risk_score:.1f}/100")
-                print(f"  Annualized Volatility: {rm.volatility_annualized:.1f}%")
-                if rm.atr:
-                    print(f"  ATR: AU${rm.atr:,.2f}")
-                if analysis.max_allocation_pct:
-                    print(f"  Max Risk-Adjusted Allocation: {analysis.max_allocation_pct:.1f}%")
-                    if asset.allocation_percent > analysis.max_allocation_pct:
-                        print(f"  ⚠️  WARNING: Current allocation exceeds risk-adjusted limit")
+            if ti.sma_200 is not None:
+                lines.append(f"  200-day SMA: AU${ti.sma_200:,.2f}")
+                if asset.current_price > 0:
+                    ma_distance = ((asset.current_price - ti.sma_200) / ti.sma_200) * 100
+                    lines.append(f"  Price vs 200-day MA: {ma_distance:+.1f}%")
             
-            # Show stop-loss suggestions if available
-            if analysis.stop_loss_suggestion and analysis.stop_loss_suggestion.recommendation != "HOLD":
-                sl = analysis.stop_loss_suggestion
-                if sl.trailing_stop:
-                    print(f"  Trailing Stop: AU${sl.trailing_stop:,.2f} ({sl.trailing_stop_pct:.1f}% below peak)")
-                if sl.emergency_stop:
-                    print(f"  Emergency Stop: AU${sl.emergency_stop:,.2f} (60% below entry)")
-                print(f"  Stop-Loss Recommendation: {sl.recommendation}")
+            if ti.macd is not None:
+                macd = ti.macd
+                macd_signal = "Bullish" if macd['histogram'] > 0 else "Bearish"
+                lines.append(f"  MACD: {macd['macd']:.2f} | Signal: {macd['signal']:.2f} | Histogram: {macd['histogram']:.2f} ({macd_signal})")
             
-            print(f"  Reason: {analysis.reason}")
-            if show_action:
-                print(f"  Action: {analysis.suggested_action}")
-        print()
+            if ti.bollinger_bands is not None:
+                bb = ti.bollinger_bands
+                if ti.price_vs_bands_position:
+                    position_map = {
+                        'above_upper': 'Above Upper Band',
+                        'upper_half': 'Upper Half',
+                        'lower_half': 'Lower Half',
+                        'below_lower': 'Below Lower Band'
+                    }
+                    position_str = position_map.get(ti.price_vs_bands_position, ti.price_vs_bands_position)
+                    lines.append(f"  Bollinger Bands: {position_str} (Upper: AU${bb['upper']:,.2f}, Lower: AU${bb['lower']:,.2f})")
+        
+        # Show DCA information for DCA recommendations
+        if analysis.recommendation in [
+            Recommendation.DCA_INCREASE, 
+            Recommendation.DCA_STANDARD, 
+            Recommendation.DCA_DECREASE,
+            Recommendation.DCA_PAUSE,
+            Recommendation.DCA_OUT_START,
+            Recommendation.DCA_OUT_ACCELERATE
+        ]:
+            lines.append(f"  DCA Multiplier: {analysis.dca_multiplier:.2f}x")
+            lines.append(f"  DCA Priority: {analysis.dca_priority}/10")
+        
+        # Show risk metrics if available
+        if analysis.risk_metrics:
+            rm = analysis.risk_metrics
+            lines.append(f"  Risk Score: {rm.risk_score:.1f}/100")
+            lines.append(f"  Annualized Volatility: {rm.volatility_annualized:.1f}%")
+            if rm.atr:
+                lines.append(f"  ATR: AU${rm.atr:,.2f}")
+            if analysis.max_allocation_pct:
+                lines.append(f"  Max Risk-Adjusted Allocation: {analysis.max_allocation_pct:.1f}%")
+                if asset.allocation_percent > analysis.max_allocation_pct:
+                    lines.append(f"  ⚠️  WARNING: Current allocation exceeds risk-adjusted limit")
+        
+        # Show stop-loss suggestions if available
+        if analysis.stop_loss_suggestion and analysis.stop_loss_suggestion.recommendation != "HOLD":
+            sl = analysis.stop_loss_suggestion
+            if sl.trailing_stop:
+                lines.append(f"  Trailing Stop: AU${sl.trailing_stop:,.2f} ({sl.trailing_stop_pct:.1f}% below peak)")
+            if sl.emergency_stop:
+                lines.append(f"  Emergency Stop: AU${sl.emergency_stop:,.2f} (60% below entry)")
+            lines.append(f"  Stop-Loss Recommendation: {sl.recommendation}")
+        
+        lines.append(f"  Reason: {analysis.reason}")
+        if show_action:
+            lines.append(f"  Action: {analysis.suggested_action}")
+        return lines
     
-    def print_report(self, analyses: List[MarketAnalysis], show_history: bool = False, show_rebalancing: bool = True):
-        """Print formatted evaluation report"""
-        print("=" * 80)
-        print("PORTFOLIO EVALUATION REPORT")
-        print(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        print("=" * 80)
-        print()
+    def print_report(
+        self,
+        analyses: List[MarketAnalysis],
+        show_history: bool = False,
+        show_rebalancing: bool = True,
+        interactive: bool = True
+    ):
+        """
+        Print formatted evaluation report
+        
+        Lines are collected in a buffer and written in one go; the buffer is
+        flushed early only before output produced elsewhere (rebalancer reports,
+        tracebacks) or before prompting for input. With interactive=False the
+        deposit-based rebalancing prompt is skipped.
+        """
+        lines: List[str] = []
+        generated_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        lines.append("=" * 80)
+        lines.append("PORTFOLIO EVALUATION REPORT")
+        lines.append(f"Generated: {generated_at}")
+        lines.append("=" * 80)
+        lines.append("")
         
         # Calculate total portfolio value
         total_value = sum(asset.value for asset in self.portfolio.values())
         
-        print(f"Total Portfolio Value: AU${total_value:,.2f}")
-        print(f"Number of Assets: {len(self.portfolio)}")
+        lines.append(f"Total Portfolio Value: AU${total_value:,.2f}")
+        lines.append(f"Number of Assets: {len(self.portfolio)}")
         
         # Show historical performance if requested and database is available
         if show_history and DATABASE_AVAILABLE:
             try:
-                db = PortfolioDatabase()
-                returns = db.calculate_returns()
-                if returns:
-                    print("\n" + "-" * 80)
-                    print("PERFORMANCE METRICS")
-                    print("-" * 80)
-                    print("Returns:")
-                    if 'daily' in returns:
-                        print(f"  24h Return: {returns['daily']:+.2f}%")
-                    if 'weekly' in returns:
-                        print(f"  7d Return: {returns['weekly']:+.2f}%")
-                    if 'monthly' in returns:
-                        print(f"  30d Return: {returns['monthly']:+.2f}%")
-                    if 'ytd' in returns:
-                        print(f"  YTD Return: {returns['ytd']:+.2f}%")
-                    if 'all_time' in returns:
-                        print(f"  All-Time Return: {returns['all_time']:+.2f}%")
+                db = _thread_db()
+                # One read transaction for all metrics: a consistent snapshot and a single lock
+                with db.read_transaction():
+                    returns = db.calculate_returns()
+                    if returns:
+                        lines.append("\n" + "-" * 80)
+                        lines.append("PERFORMANCE METRICS")
+                        lines.append("-" * 80)
+                        lines.append("Returns:")
+                        if 'daily' in returns:
+                            lines.append(f"  24h Return: {returns['daily']:+.2f}%")
+                        if 'weekly' in returns:
+                            lines.append(f"  7d Return: {returns['weekly']:+.2f}%")
+                        if 'monthly' in returns:
+                            lines.append(f"  30d Return: {returns['monthly']:+.2f}%")
+                        if 'ytd' in returns:
+                            lines.append(f"  YTD Return: {returns['ytd']:+.2f}%")
+                        if 'all_time' in returns:
+                            lines.append(f"  All-Time Return: {returns['all_time']:+.2f}%")
                     
-                    # Advanced metrics
-                    print("\nRisk-Adjusted Metrics:")
-                    sharpe = db.calculate_sharpe_ratio(days=365)
-                    if sharpe is not None:
-                        sharpe_rating = "Excellent" if sharpe > 3 else "Very Good" if sharpe > 2 else "Good" if sharpe > 1 else "Below Average"
-                        print(f"  Sharpe Ratio: {sharpe:.2f} ({sharpe_rating})")
+                        # Advanced metrics
+                        lines.append("\nRisk-Adjusted Metrics:")
+                        sharpe = db.calculate_sharpe_ratio(days=365)
+                        if sharpe is not None:
+                            sharpe_rating = "Excellent" if sharpe > 3 else "Very Good" if sharpe > 2 else "Good" if sharpe > 1 else "Below Average"
+                            lines.append(f"  Sharpe Ratio: {sharpe:.2f} ({sharpe_rating})")
                     
-                    sortino = db.calculate_sortino_ratio(days=365)
-                    if sortino is not None:
-                        if sortino < 999:
-                            sortino_rating = "Excellent" if sortino > 3 else "Very Good" if sortino > 2 else "Good" if sortino > 1 else "Below Average"
-                            print(f"  Sortino Ratio: {sortino:.2f} ({sortino_rating})")
-                        else:
-                            print(f"  Sortino Ratio: Perfect (no downside volatility)")
+                        sortino = db.calculate_sortino_ratio(days=365)
+                        if sortino is not None:
+                            if sortino < 999:
+                                sortino_rating = "Excellent" if sortino > 3 else "Very Good" if sortino > 2 else "Good" if sortino > 1 else "Below Average"
+                                lines.append(f"  Sortino Ratio: {sortino:.2f} ({sortino_rating})")
+                            else:
+                                lines.append(f"  Sortino Ratio: Perfect (no downside volatility)")
                     
-                    # Maximum Drawdown
-                    drawdown = db.calculate_max_drawdown(days=365)
-                    if drawdown:
-                        print(f"\nMaximum Drawdown:")
-                        print(f"  Drawdown: {drawdown['max_drawdown_pct']:.2f}% (AU${drawdown['max_drawdown_value']:,.2f})")
-                        if drawdown['peak_date']:
-                            print(f"  Peak Date: {drawdown['peak_date'].strftime('%Y-%m-%d')}")
-                        if drawdown['trough_date']:
-                            print(f"  Trough Date: {drawdown['trough_date'].strftime('%Y-%m-%d')}")
-                        if drawdown['recovery_date']:
-                            print(f"  Recovery Date: {drawdown['recovery_date'].strftime('%Y-%m-%d')}")
-                            if drawdown['days_to_recover']:
-                                print(f"  Days to Recover: {drawdown['days_to_recover']}")
-                        elif drawdown['trough_date']:
-                            print(f"  Status: Not yet recovered")
+                        # Maximum Drawdown
+                        drawdown = db.calculate_max_drawdown(days=365)
+                        if drawdown:
+                            lines.append(f"\nMaximum Drawdown:")
+                            lines.append(f"  Drawdown: {drawdown['max_drawdown_pct']:.2f}% (AU${drawdown['max_drawdown_value']:,.2f})")
+                            if drawdown['peak_date']:
+                                lines.append(f"  Peak Date: {drawdown['peak_date'].strftime('%Y-%m-%d')}")
+                            if drawdown['trough_date']:
+                                lines.append(f"  Trough Date: {drawdown['trough_date'].strftime('%Y-%m-%d')}")
+                            if drawdown['recovery_date']:
+                                lines.append(f"  Recovery Date: {drawdown['recovery_date'].strftime('%Y-%m-%d')}")
+                                if drawdown['days_to_recover']:
+                                    lines.append(f"  Days to Recover: {drawdown['days_to_recover']}")
+                            elif drawdown['trough_date']:
+                                lines.append(f"  Status: Not yet recovered")
                     
-                    # Benchmark Comparison
-                    benchmark = db.calculate_benchmark_comparison(benchmark_symbol="BTC", days=365)
-                    if benchmark and 'error' not in benchmark:
-                        print(f"\nBenchmark Comparison (vs BTC):")
-                        if benchmark.get('portfolio_return') is not None:
-                            print(f"  Portfolio Return: {benchmark['portfolio_return']:+.2f}%")
-                        if benchmark.get('benchmark_return') is not None:
-                            print(f"  BTC Return: {benchmark['benchmark_return']:+.2f}%")
-                        if benchmark.get('excess_return') is not None:
-                            outperformance = benchmark['excess_return']
-                            status = "Outperforming" if outperformance > 0 else "Underperforming"
-                            print(f"  Excess Return: {outperformance:+.2f}% ({status})")
-                        if benchmark.get('beta') is not None:
-                            beta = benchmark['beta']
-                            beta_desc = "More volatile" if beta > 1 else "Less volatile" if beta < 1 else "Similar volatility"
-                            print(f"  Beta: {beta:.2f} ({beta_desc} than BTC)")
-                    elif benchmark and 'error' in benchmark:
-                        print(f"\nBenchmark Comparison: {benchmark['error']}")
+                        # Benchmark Comparison
+                        benchmark = db.calculate_benchmark_comparison(benchmark_symbol="BTC", days=365)
+                        if benchmark and 'error' not in benchmark:
+                            lines.append(f"\nBenchmark Comparison (vs BTC):")
+                            if benchmark.get('portfolio_return') is not None:
+                                lines.append(f"  Portfolio Return: {benchmark['portfolio_return']:+.2f}%")
+                            if benchmark.get('benchmark_return') is not None:
+                                lines.append(f"  BTC Return: {benchmark['benchmark_return']:+.2f}%")
+                            if benchmark.get('excess_return') is not None:
+                                outperformance = benchmark['excess_return']
+                                status = "Outperforming" if outperformance > 0 else "Underperforming"
+                                lines.append(f"  Excess Return: {outperformance:+.2f}% ({status})")
+                            if benchmark.get('beta') is not None:
+                                beta = benchmark['beta']
+                                beta_desc = "More volatile" if beta > 1 else "Less volatile" if beta < 1 else "Similar volatility"
+                                lines.append(f"  Beta: {beta:.2f} ({beta_desc} than BTC)")
+                        elif benchmark and 'error' in benchmark:
+                            lines.append(f"\nBenchmark Comparison: {benchmark['error']}")
                     
-                    snapshot_count = db.get_snapshot_count()
-                    print(f"\nHistorical Snapshots: {snapshot_count}")
-                db.close()
+                        snapshot_count = db.get_snapshot_count()
+                        lines.append(f"\nHistorical Snapshots: {snapshot_count}")
             except Exception as e:
-                print(f"\nNote: Could not load historical data: {e}")
+                lines.append(f"\nNote: Could not load historical data: {e}")
                 import traceback
+                _flush_lines(lines)
                 traceback.print_exc()
         
         # Calculate portfolio risk analysis
@@ -1269,7 +1613,7 @@ class PortfolioEvaluator:
             
             if DATABASE_AVAILABLE:
                 try:
-                    db = PortfolioDatabase()
+                    db = _thread_db()
                     for symbol in self.portfolio.keys():
                         # Get risk metrics from analyses
                         for analysis in analyses:
@@ -1280,7 +1624,6 @@ class PortfolioEvaluator:
                         historical_prices = db.get_historical_prices(symbol, days=200)
                         if historical_prices:
                             asset_prices_dict[symbol] = [price for _, price in historical_prices]
-                    db.close()
                     
                     # Calculate portfolio risk if we have data
                     if risk_metrics_dict and asset_prices_dict:
@@ -1303,24 +1646,26 @@ class PortfolioEvaluator:
         
         # Display portfolio risk analysis if available
         if portfolio_risk:
-            print("\n" + "-" * 80)
-            print("PORTFOLIO RISK ANALYSIS")
-            print("-" * 80)
-            print(f"Total Risk Score: {portfolio_risk.total_risk_score:.1f}/100")
-            print(f"Diversification Score: {portfolio_risk.diversification_score:.1f}/100")
-            print(f"Concentration Risk: {portfolio_risk.concentration_risk:.1f}%")
-            print(f"Correlation Risk: {portfolio_risk.correlation_risk:.1f}/100")
+            lines.append("\n" + "-" * 80)
+            lines.append("PORTFOLIO RISK ANALYSIS")
+            lines.append("-" * 80)
+            lines.append(f"Total Risk Score: {portfolio_risk.total_risk_score:.1f}/100")
+            lines.append(f"Diversification Score: {portfolio_risk.diversification_score:.1f}/100")
+            lines.append(f"Concentration Risk: {portfolio_risk.concentration_risk:.1f}%")
+            lines.append(f"Correlation Risk: {portfolio_risk.correlation_risk:.1f}/100")
             
             if portfolio_risk.warnings:
-                print("\n⚠️  RISK WARNINGS:")
+                lines.append("\n⚠️  RISK WARNINGS:")
                 for warning in portfolio_risk.warnings:
-                    print(f"  - {warning}")
-            print()
+                    lines.append(f"  - {warning}")
+            lines.append("")
         
         # Get rebalancing actions for summary (calculate once, use multiple times)
         rebalancing_actions = []
+        actions_by_type = defaultdict(list)
         if show_rebalancing and REBALANCER_AVAILABLE:
             try:
+                from portfolio_rebalancer import PortfolioRebalancer
                 rebalancer = PortfolioRebalancer()
                 # Get market data for assets not in portfolio (if available)
                 market_data = getattr(self, 'market_data', None)
@@ -1330,29 +1675,33 @@ class PortfolioEvaluator:
                     risk_adjusted_limits=risk_adjusted_limits
                 )
                 if rebalancing_actions:
-                    print("\n")
+                    lines.append("\n")
+                    _flush_lines(lines)
                     rebalancer.print_rebalancing_report(rebalancing_actions, total_value, show_hold=False)
                     
                     # Check if there are sell actions - if so, offer deposit-based alternative
-                    sell_actions = [a for a in rebalancing_actions if a.action == "SELL"]
-                    buy_actions = [a for a in rebalancing_actions if a.action == "BUY"]
+                    for action in rebalancing_actions:
+                        actions_by_type[action.action].append(action)
+                    sell_actions = actions_by_type["SELL"]
+                    buy_actions = actions_by_type["BUY"]
                     
-                    if sell_actions or buy_actions:
-                        print("\n" + "=" * 100)
-                        print("DEPOSIT-BASED REBALANCING OPTION")
-                        print("=" * 100)
-                        print("Instead of selling assets, you can rebalance using new deposits.")
-                        print("This avoids capital gains taxes and keeps your portfolio growing.")
-                        print()
+                    if (sell_actions or buy_actions) and interactive:
+                        lines.append("\n" + "=" * 100)
+                        lines.append("DEPOSIT-BASED REBALANCING OPTION")
+                        lines.append("=" * 100)
+                        lines.append("Instead of selling assets, you can rebalance using new deposits.")
+                        lines.append("This avoids capital gains taxes and keeps your portfolio growing.")
+                        lines.append("")
                         
                         # Calculate minimum deposit needed to fully rebalance
                         total_buy_needed = sum(a.value_diff for a in buy_actions if a.value_diff > 0)
                         if total_buy_needed > 0:
-                            print(f"Minimum deposit to fully rebalance: AU${total_buy_needed:,.2f}")
-                            print("(You can deposit any amount - smaller deposits will partially rebalance)")
-                            print()
+                            lines.append(f"Minimum deposit to fully rebalance: AU${total_buy_needed:,.2f}")
+                            lines.append("(You can deposit any amount - smaller deposits will partially rebalance)")
+                            lines.append("")
                         
                         try:
+                            _flush_lines(lines)
                             deposit_input = input("Enter deposit amount (AUD) to see allocation plan (or press Enter to skip): ").strip()
                             if deposit_input:
                                 deposit_amount = float(deposit_input)
@@ -1363,6 +1712,7 @@ class PortfolioEvaluator:
                                         if analysis.dca_priority > 0:
                                             dca_priorities[analysis.symbol] = analysis.dca_priority
                                     
+                                    _flush_lines(lines)
                                     rebalancer.print_deposit_allocation_report(
                                         self.portfolio,
                                         deposit_amount,
@@ -1370,65 +1720,70 @@ class PortfolioEvaluator:
                                         dca_priorities=dca_priorities if dca_priorities else None
                                     )
                                 else:
-                                    print("Deposit amount must be greater than 0.")
+                                    lines.append("Deposit amount must be greater than 0.")
                         except (ValueError, EOFError, KeyboardInterrupt):
                             # Handle invalid input or non-interactive mode
                             pass
             except Exception as e:
-                print(f"\nNote: Could not generate rebalancing report: {e}")
+                lines.append(f"\nNote: Could not generate rebalancing report: {e}")
                 rebalancing_actions = []
+                actions_by_type.clear()
         
-        print()
+        lines.append("")
         
         # Calculate rebalancing counts for summary
-        rebalancing_buy_count = len([a for a in rebalancing_actions if a.action == "BUY"]) if rebalancing_actions else 0
-        rebalancing_sell_count = len([a for a in rebalancing_actions if a.action == "SELL"]) if rebalancing_actions else 0
-        rebalancing_hold_count = len([a for a in rebalancing_actions if a.action == "HOLD"]) if rebalancing_actions else 0
-        
-        # Group DCA recommendations
-        dca_increase = [a for a in analyses if a.recommendation == Recommendation.DCA_INCREASE]
-        dca_standard = [a for a in analyses if a.recommendation == Recommendation.DCA_STANDARD]
-        dca_decrease = [a for a in analyses if a.recommendation == Recommendation.DCA_DECREASE]
-        dca_pause = [a for a in analyses if a.recommendation == Recommendation.DCA_PAUSE]
-        dca_out = [a for a in analyses if a.recommendation in [
-            Recommendation.DCA_OUT_START, 
-            Recommendation.DCA_OUT_ACCELERATE
-        ]]
+        rebalancing_buy_count = len(actions_by_type["BUY"])
+        rebalancing_sell_count = len(actions_by_type["SELL"])
+        rebalancing_hold_count = len(actions_by_type["HOLD"])
+        
+        # Group DCA recommendations in one pass; both DCA-out variants share a section
+        by_recommendation = defaultdict(list)
+        for analysis in analyses:
+            recommendation = analysis.recommendation
+            if recommendation is Recommendation.DCA_OUT_ACCELERATE:
+                recommendation = Recommendation.DCA_OUT_START
+            by_recommendation[recommendation].append(analysis)
+        dca_increase = by_recommendation[Recommendation.DCA_INCREASE]
+        dca_standard = by_recommendation[Recommendation.DCA_STANDARD]
+        dca_decrease = by_recommendation[Recommendation.DCA_DECREASE]
+        dca_pause = by_recommendation[Recommendation.DCA_PAUSE]
+        dca_out = by_recommendation[Recommendation.DCA_OUT_START]
         
         # Print DCA recommendations first (if any)
         if dca_increase:
             # Sort by priority
             dca_increase.sort(key=lambda x: x.dca_priority, reverse=True)
-            self._print_recommendation_section("DCA", "INCREASE DCA AMOUNT", dca_increase, show_action=True)
+            lines.extend(self._format_recommendation_section("DCA", "INCREASE DCA AMOUNT", dca_increase, show_action=True))
         
         if dca_standard:
-            self._print_recommendation_section("DCA", "STANDARD DCA SCHEDULE", dca_standard, show_action=True)
+            lines.extend(self._format_recommendation_section("DCA", "STANDARD DCA SCHEDULE", dca_standard, show_action=True))
         
         if dca_decrease:
-            self._print_recommendation_section("DCA", "REDUCE DCA AMOUNT", dca_decrease, show_action=True)
+            lines.extend(self._format_recommendation_section("DCA", "REDUCE DCA AMOUNT", dca_decrease, show_action=True))
         
         if dca_pause:
-            self._print_recommendation_section("DCA", "PAUSE DCA", dca_pause, show_action=True)
+            lines.extend(self._format_recommendation_section("DCA", "PAUSE DCA", dca_pause, show_action=True))
         
         if dca_out:
-            self._print_recommendation_section("DCA", "DCA OUT STRATEGY", dca_out, show_action=True)
+            lines.extend(self._format_recommendation_section("DCA", "DCA OUT STRATEGY", dca_out, show_action=True))
         
         # Summary
-        print("=" * 80)
-        print("SUMMARY")
-        print("=" * 80)
-        print(f"DCA Increase: {len(dca_increase)}")
-        print(f"DCA Standard: {len(dca_standard)}")
-        print(f"DCA Decrease: {len(dca_decrease)}")
-        print(f"DCA Pause: {len(dca_pause)}")
-        print(f"DCA Out: {len(dca_out)}")
-        print(f"Rebalancing - Assets to Sell: {rebalancing_sell_count}")
-        print(f"Rebalancing - Assets to Buy: {rebalancing_buy_count}")
-        print(f"Rebalancing - Assets to Hold: {rebalancing_hold_count}")
-        print()
-        print("[!] DISCLAIMER: This is an automated analysis tool. Always do your own")
-        print("   research and consider your risk tolerance before making trading decisions.")
-        print("=" * 80)
+        lines.append("=" * 80)
+        lines.append("SUMMARY")
+        lines.append("=" * 80)
+        lines.append(f"DCA Increase: {len(dca_increase)}")
+        lines.append(f"DCA Standard: {len(dca_standard)}")
+        lines.append(f"DCA Decrease: {len(dca_decrease)}")
+        lines.append(f"DCA Pause: {len(dca_pause)}")
+        lines.append(f"DCA Out: {len(dca_out)}")
+        lines.append(f"Rebalancing - Assets to Sell: {rebalancing_sell_count}")
+        lines.append(f"Rebalancing - Assets to Buy: {rebalancing_buy_count}")
+        lines.append(f"Rebalancing - Assets to Hold: {rebalancing_hold_count}")
+        lines.append("")
+        lines.append("[!] DISCLAIMER: This is an automated analysis tool. Always do your own")
+        lines.append("   research and consider your risk tolerance before making trading decisions.")
+        lines.append("=" * 80)
+        _flush_lines(lines)
 
 
 def load_portfolio_from_balances(balances: Dict[str, float], market_data: Dict) -> Dict[str, Asset]:
@@ -1442,38 +1797,69 @@ def load_portfolio_from_balances(balances: Dict[str, float], market_data: Dict)
     Returns:
         Dictionary of Asset objects
     """
-    portfolio = {}
-    total_value = 0.0
-    
-    # First pass: calculate values
-    asset_values = {}
-    for symbol, amount in balances.items():
-        if symbol in market_data:
-            price = market_data[symbol]["current_price"]
-            value = amount * price
-            asset_values[symbol] = value
-            total_value += value
-    
-    # Second pass: create Asset objects with allocations
-    for symbol, amount in balances.items():
-        if symbol in market_data:
-            price = market_data[symbol]["current_price"]
-            value = asset_values[symbol]
-            allocation = (value / total_value * 100) if total_value > 0 else 0
-            
-            portfolio[symbol] = Asset(
-                symbol=symbol,
-                name=COIN_NAMES.get(symbol, symbol),
-                amount=amount,
-                current_price=price,
-                allocation_percent=allocation,
-                value=value
-            )
+    return PortfolioFrame.from_balances(balances, market_data).to_assets()
+
+
+def load_portfolio_from_snapshot() -> Tuple[Optional[Dict[str, Asset]], Optional[Dict]]:
+    """
+    Load the portfolio and its market data from the most recent saved snapshot
+    
+    Used by --dry-run, which evaluates without any network access.
+    
+    Returns:
+        Tuple of (Dictionary of Asset objects, market_data Dict) or (None, None)
+        if the database is unavailable or holds no snapshots
+    """
+    if not DATABASE_AVAILABLE:
+        return None, None
     
-    return portfolio
+    db = _thread_db()
+    snapshot = db.get_latest_snapshot()
+    if snapshot is None or not snapshot.assets:
+        return None, None
+    
+    portfolio = {
+        symbol: Asset(
+            symbol=symbol,
+            name=row.name or COIN_NAMES.get(symbol, symbol),
+            amount=row.amount,
+            current_price=row.price,
+            allocation_percent=row.allocation_percent,
+            value=row.value
+        )
+        for symbol, row in snapshot.assets.items()
+    }
+    return portfolio, db.get_latest_market_data()
+
+
+def _fetch_balances_and_market_data(
+    fetcher: "BlockchainBalanceFetcher",
+    evaluator: "PortfolioEvaluator",
+    wallet_config: Dict,
+    prompt_for_btc: bool
+) -> Tuple[Dict[str, float], Dict]:
+    """
+    Fetch wallet balances and market data concurrently
+    
+    Market data for every known coin is requested on a worker thread while the
+    balances are fetched on the calling thread (which may prompt for a BTC
+    balance); the held symbols are not known until the balances arrive. Coins
+    the markets endpoint misses are already tried by its /simple/price fallback.
+    
+    Returns:
+        Tuple of (balances, market_data); market_data covers all of COIN_IDS
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        market_future = executor.submit(evaluator.fetch_market_data, list(COIN_IDS))
+        balances = fetcher.fetch_all_balances(wallet_config, prompt_for_btc=prompt_for_btc)
+        return balances, market_future.result()
 
 
-def load_portfolio_from_wallet(wallet_config_path: str = "wallet_config.json", prompt_for_btc: bool = True) -> Tuple[Optional[Dict[str, Asset]], Optional[Dict]]:
+def load_portfolio_from_wallet(
+    wallet_config_path: str = "wallet_config.json",
+    prompt_for_btc: bool = True
+) -> Tuple[Optional[Dict[str, Asset]], Optional[Dict]]:
     """
     Load portfolio automatically from wallet addresses
     
@@ -1483,9 +1869,12 @@ def load_portfolio_from_wallet(wallet_config_path: str = "wallet_config.json", p
                        Set to False for non-interactive use (e.g., API servers)
         
     Returns:
-        Tuple of (Dictionary of Asset objects, market_data Dict) or (None, None) if loading fails
+        Tuple of (Dictionary of Asset objects, market_data Dict) or (None, None) if loading fails;
+        market_data covers every coin in COIN_IDS
     """
-    if not BLOCKCHAIN_FETCHER_AVAILABLE:
+    try:
+        from blockchain_balance_fetcher import BlockchainBalanceFetcher
+    except ImportError:
         print("Error: blockchain_balance_fetcher module not available")
         return None, None
     
@@ -1495,8 +1884,8 @@ def load_portfolio_from_wallet(wallet_config_path: str = "wallet_config.json", p
         return None, None
     
     try:
-        with open(wallet_config_path, 'r') as f:
-            wallet_config = json.load(f)
+        with open(wallet_config_path, 'rb') as f:
+            wallet_config = loads_json(f.read())
     except Exception as e:
         print(f"Error reading wallet config: {e}")
         return None, None
@@ -1510,21 +1899,18 @@ def load_portfolio_from_wallet(wallet_config_path: str = "wallet_config.json", p
     
     fetcher = BlockchainBalanceFetcher(etherscan_api_key=etherscan_key)
     
-    # Fetch balances - pass prompt_for_btc parameter
-    balances = fetcher.fetch_all_balances(wallet_config, prompt_for_btc=prompt_for_btc)
+    # Temporary evaluator to use its market data fetching
+    evaluator = PortfolioEvaluator({})
+    # Balances and prices are independent, so fetch them at the same time
+    print("Fetching wallet balances and current market prices...")
+    balances, market_data = _fetch_balances_and_market_data(
+        fetcher, evaluator, wallet_config, prompt_for_btc
+    )
     
     if not balances:
         print("No balances found. Please check your wallet addresses.")
         return None, None
     
-    # Fetch market prices for all assets
-    print("Fetching current market prices...")
-    # Create temporary evaluator to use its fetch_market_data method
-    temp_portfolio = {symbol: Asset(symbol=symbol, name=symbol, amount=0, current_price=0, allocation_percent=0, value=0) 
-                     for symbol in balances.keys()}
-    evaluator = PortfolioEvaluator(temp_portfolio)
-    market_data = evaluator.fetch_market_data(list(balances.keys()))
-    
     if not market_data:
         print("Error: Could not fetch market prices")
         return None, None
@@ -1535,6 +1921,27 @@ def load_portfolio_from_wallet(wallet_config_path: str = "wallet_config.json", p
     return portfolio, market_data
 
 
+_THREAD_DB = threading.local()
+
+
+def _thread_db() -> "PortfolioDatabase":
+    """
+    PortfolioDatabase shared by the report, snapshot and history paths of one thread
+    
+    sqlite3 connections may only be used by the thread that opened them, and
+    the dashboard evaluates portfolios from request threads, so each thread
+    gets its own handle. It is opened on first use so a CLI run pays the
+    connection setup once; the main thread's handle is closed at interpreter
+    exit, other threads' handles when the thread finishes.
+    """
+    db = getattr(_THREAD_DB, "db", None)
+    if db is None:
+        db = _THREAD_DB.db = PortfolioDatabase()
+        if threading.current_thread() is threading.main_thread():
+            atexit.register(db.close)
+    return db
+
+
 def save_portfolio_snapshot(portfolio: Dict[str, Asset], analyses: List[MarketAnalysis], enabled: bool = True):
     """
     Save current portfolio state to database
@@ -1548,14 +1955,20 @@ def save_portfolio_snapshot(portfolio: Dict[str, Asset], analyses: List[MarketAn
         return
     
     try:
-        db = PortfolioDatabase()
-        snapshot_id = db.save_snapshot(portfolio, analyses)
-        db.close()
+        snapshot_id = _thread_db().save_snapshot(portfolio, analyses)
         print(f"\n[✓] Portfolio snapshot saved (ID: {snapshot_id})")
     except Exception as e:
         print(f"\n[!] Warning: Could not save portfolio snapshot: {e}")
 
 
+def _format_minutes(timestamps: List[datetime]) -> List[str]:
+    """Format datetimes as 'YYYY-MM-DD HH:MM', in one NumPy call when available"""
+    if not NUMPY_AVAILABLE:
+        return [timestamp.strftime("%Y-%m-%d %H:%M") for timestamp in timestamps]
+    formatted = np.datetime_as_string(np.array(timestamps, dtype="datetime64[m]"), unit="m")
+    return [text.replace("T", " ") for text in formatted.tolist()]
+
+
 def print_portfolio_history(days: int = 30):
     """
     Print portfolio value history
@@ -1568,22 +1981,22 @@ def print_portfolio_history(days: int = 30):
         return
     
     try:
-        db = PortfolioDatabase()
-        history = db.get_portfolio_value_history(days=days)
-        db.close()
+        history = _thread_db().get_portfolio_value_history(days=days)
         
         if not history:
             print(f"No historical data found for the last {days} days.")
             return
         
-        print("=" * 80)
-        print(f"PORTFOLIO VALUE HISTORY (Last {days} days)")
-        print("=" * 80)
-        print(f"{'Date':<20} {'Value (AUD)':<20} {'Change':<15} {'Change %':<15}")
-        print("-" * 80)
+        lines = [
+            "=" * 80,
+            f"PORTFOLIO VALUE HISTORY (Last {days} days)",
+            "=" * 80,
+            f"{'Date':<20} {'Value (AUD)':<20} {'Change':<15} {'Change %':<15}",
+            "-" * 80
+        ]
         
         prev_value = None
-        for timestamp, value in history:
+        for date_str, (_, value) in zip(_format_minutes([timestamp for timestamp, _ in history]), history):
             change_str = ""
             change_pct_str = ""
             if prev_value is not None:
@@ -1592,24 +2005,96 @@ def print_portfolio_history(days: int = 30):
                 change_str = f"AU${change:+,.2f}"
                 change_pct_str = f"{change_pct:+.2f}%"
             
-            date_str = timestamp.strftime("%Y-%m-%d %H:%M")
-            print(f"{date_str:<20} AU${value:>15,.2f} {change_str:>15} {change_pct_str:>15}")
+            lines.append(f"{date_str:<20} AU${value:>15,.2f} {change_str:>15} {change_pct_str:>15}")
             prev_value = value
         
-        print("=" * 80)
+        lines.append("=" * 80)
+        _flush_lines(lines)
         
     except Exception as e:
         print(f"Error loading portfolio history: {e}")
 
 
-def main(save_snapshot: bool = True, show_rebalancing: bool = True):
+# Manual portfolio used when no wallet config is available (from the dashboard
+# data); Asset is frozen, so main() can hand out shallow copies of one instance set
+_DEFAULT_PORTFOLIO: Mapping[str, Asset] = MappingProxyType({
+    "XRP": Asset(
+        symbol="XRP",
+        name="Ripple",
+        amount=295.843,
+        current_price=3.08,
+        allocation_percent=44.81,
+        value=913.09
+    ),
+    "BTC": Asset(
+        symbol="BTC",
+        name="Bitcoin",
+        amount=0.00622109,
+        current_price=134840.44,
+        allocation_percent=41.16,
+        value=838.85
+    ),
+    "ETH": Asset(
+        symbol="ETH",
+        name="Ethereum",
+        amount=0.028903,
+        current_price=4585.27,
+        allocation_percent=6.5,
+        value=132.52
+    ),
+    "SOL": Asset(
+        symbol="SOL",
+        name="Solana",
+        amount=0.432648,
+        current_price=199.96,
+        allocation_percent=4.24,
+        value=86.51
+    ),
+    "LINK": Asset(
+        symbol="LINK",
+        name="Chainlink",
+        amount=3.17046,
+        current_price=21.01,
+        allocation_percent=3.27,
+        value=66.63
+    )
+})
+
+
+def main(save_snapshot: bool = True, show_rebalancing: bool = True, dry_run: bool = False):
     """
     Main function - initialize portfolio and run evaluation
     
     Args:
         save_snapshot: Whether to save portfolio snapshot to database (default: True)
         show_rebalancing: Whether to show rebalancing recommendations (default: True)
+        dry_run: Re-evaluate the latest saved snapshot without network access,
+                 database writes or prompts (default: False)
     """
+    if dry_run:
+        portfolio, market_data = load_portfolio_from_snapshot()
+        if portfolio is None:
+            print("Error: --dry-run needs a saved portfolio snapshot. Run once without it first.")
+            return
+        print("\nDry run: evaluating the latest saved snapshot (no network, nothing saved)\n")
+        evaluator = PortfolioEvaluator(portfolio, offline=True)
+        analyses = evaluator.evaluate_portfolio(market_data=market_data)
+        if analyses:
+            evaluator.print_report(
+                analyses, show_history=True, show_rebalancing=show_rebalancing, interactive=False
+            )
+        else:
+            print("Error: Could not generate portfolio analysis.")
+        return
+    
+    # Target allocation assets need prices too (for rebalancing). The wallet
+    # load prices every known coin; a manual portfolio adds them to its own
+    # request. Without rebalancing they are never used, so only the portfolio
+    # is priced
+    target_symbols = []
+    if REBALANCER_AVAILABLE and show_rebalancing:
+        from portfolio_rebalancer import PortfolioRebalancer
+        target_symbols = list(PortfolioRebalancer().target_allocations.keys())
     
     # Try to load portfolio from wallet addresses first
     portfolio, market_data = load_portfolio_from_wallet()
@@ -1620,65 +2105,12 @@ def main(save_snapshot: bool = True, show_rebalancing: bool = True):
         print("\nUsing manual portfolio configuration...")
         print("(To use automatic wallet syncing, set up wallet_config.json)\n")
         
-        # Initialize portfolio based on the dashboard data
-        portfolio = {
-            "XRP": Asset(
-                symbol="XRP",
-                name="Ripple",
-                amount=295.843,
-                current_price=3.08,
-                allocation_percent=44.81,
-                value=913.09
-            ),
-            "BTC": Asset(
-                symbol="BTC",
-                name="Bitcoin",
-                amount=0.00622109,
-                current_price=134840.44,
-                allocation_percent=41.16,
-                value=838.85
-            ),
-            "ETH": Asset(
-                symbol="ETH",
-                name="Ethereum",
-                amount=0.028903,
-                current_price=4585.27,
-                allocation_percent=6.5,
-                value=132.52
-            ),
-            "SOL": Asset(
-                symbol="SOL",
-                name="Solana",
-                amount=0.432648,
-                current_price=199.96,
-                allocation_percent=4.24,
-                value=86.51
-            ),
-            "LINK": Asset(
-                symbol="LINK",
-                name="Chainlink",
-                amount=3.17046,
-                current_price=21.01,
-                allocation_percent=3.27,
-                value=66.63
-            )
-        }
+        portfolio = dict(_DEFAULT_PORTFOLIO)
     
     # Create evaluator and run analysis
     # Pass market_data if we already have it to avoid duplicate API calls
     evaluator = PortfolioEvaluator(portfolio)
-    analyses = evaluator.evaluate_portfolio(market_data=market_data)
-    
-    # Ensure we have market data for all target allocation assets (for rebalancing)
-    if REBALANCER_AVAILABLE and analyses:
-        rebalancer = PortfolioRebalancer()
-        target_symbols = list(rebalancer.target_allocations.keys())
-        missing_symbols = [s for s in target_symbols if s not in evaluator.market_data]
-        if missing_symbols:
-            # Fetch prices for assets in target allocation but not in portfolio
-            print(f"Fetching prices for target allocation assets: {', '.join(missing_symbols)}")
-            additional_market_data = evaluator.fetch_market_data(missing_symbols)
-            evaluator.market_data.update(additional_market_data)
+    analyses = evaluator.evaluate_portfolio(market_data=market_data, extra_symbols=target_symbols)
     
     if analyses:
         # Save snapshot to database (unless disabled)
@@ -1689,14 +2121,23 @@ def main(save_snapshot: bool = True, show_rebalancing: bool = True):
         
         # Show brief history summary
         if DATABASE_AVAILABLE:
-            print("\n" + "=" * 80)
-            print("TIP: Use 'python portfolio_evaluator.py --history 30' to view detailed history")
-            print("=" * 80)
+            _flush_lines([
+                "\n" + "=" * 80,
+                "TIP: Use 'python portfolio_evaluator.py --history 30' to view detailed history",
+                "=" * 80
+            ])
     else:
         print("Error: Could not generate portfolio analysis.")
 
 
 if __name__ == "__main__":
+    # The usual flagless run goes straight to main(); argparse is only
+    # imported when there are options to parse (or --help to print)
+    if len(sys.argv) == 1:
+        main()
+        sys.exit(0)
+    
+    import argparse
     parser = argparse.ArgumentParser(
         description="Cryptocurrency Portfolio Evaluator with Historical Tracking"
     )
@@ -1716,6 +2157,16 @@ if __name__ == "__main__":
         action="store_true",
         help="Skip rebalancing recommendations"
     )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Ignore cached market data and fetch fresh prices"
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Re-evaluate the latest saved snapshot without fetching, saving or prompting"
+    )
     parser.add_argument(
         "--dashboard",
         action="store_true",
@@ -1723,6 +2174,7 @@ if __name__ == "__main__":
     )
     
     args = parser.parse_args()
+    MARKET_CACHE_ENABLED = not args.no_cache
     
     # If --dashboard is specified, start the dashboard server
     if args.dashboard:
@@ -1751,4 +2203,8 @@ if __name__ == "__main__":
         sys.exit(0)
     
     # Otherwise, run normal evaluation
-    main(save_snapshot=not args.no_save, show_rebalancing=not args.no_rebalancing)
+    main(
+        save_snapshot=not args.no_save,
+        show_rebalancing=not args.no_rebalancing,
+        dry_run=args.dry_run
+    )
@@ -5,7 +5,7 @@ Calculates exact buy/sell amounts needed to reach target allocations
 
 from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
-from portfolio_evaluator import Asset
+from portfolio_evaluator import Asset, _flush_lines
 
 try:
     from transaction_tracker import TransactionTracker, TransactionType
@@ -34,7 +34,7 @@ except ImportError:
     REBALANCE_THRESHOLD = 2.0
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class RebalancingAction:
     """Represents a single rebalancing action for an asset"""
     symbol: str
@@ -214,11 +214,13 @@ class PortfolioRebalancer:
             portfolio_value: Total portfolio value
             show_hold: Whether to show assets that should be held (no action)
         """
-        print("=" * 100)
-        print("PORTFOLIO REBALANCING REPORT")
-        print("=" * 100)
-        print(f"Total Portfolio Value: AU${portfolio_value:,.2f}")
-        print()
+        # Built as a list of lines and written with a single print
+        lines = []
+        lines.append("=" * 100)
+        lines.append("PORTFOLIO REBALANCING REPORT")
+        lines.append("=" * 100)
+        lines.append(f"Total Portfolio Value: AU${portfolio_value:,.2f}")
+        lines.append("")
         
         # Separate actions by type
         buy_actions = [a for a in actions if a.action == "BUY"]
@@ -227,10 +229,10 @@ class PortfolioRebalancer:
         
         # Print sell actions first
         if sell_actions:
-            print("[SELL] ASSETS TO REDUCE")
-            print("-" * 100)
-            print(f"{'Asset':<15} {'Current %':<12} {'Target %':<12} {'Diff %':<12} {'Current Value':<18} {'Sell Value':<18} {'Sell Amount':<18}")
-            print("-" * 100)
+            lines.append("[SELL] ASSETS TO REDUCE")
+            lines.append("-" * 100)
+            lines.append(f"{'Asset':<15} {'Current %':<12} {'Target %':<12} {'Diff %':<12} {'Current Value':<18} {'Sell Value':<18} {'Sell Amount':<18}")
+            lines.append("-" * 100)
             
             total_sell_value = 0.0
             for action in sell_actions:
@@ -239,7 +241,7 @@ class PortfolioRebalancer:
                 
                 sell_amount_str = f"{abs(action.amount_diff):.8f} {action.symbol}" if action.current_price > 0 else "N/A"
                 
-                print(
+                lines.append(
                     f"{action.name:<15} "
                     f"{action.current_allocation:>10.2f}% "
                     f"{action.target_allocation:>10.2f}% "
@@ -249,16 +251,16 @@ class PortfolioRebalancer:
                     f"{sell_amount_str:>18}"
                 )
             
-            print("-" * 100)
-            print(f"{'TOTAL TO SELL':<51} AU${total_sell_value:>15,.2f}")
-            print()
+            lines.append("-" * 100)
+            lines.append(f"{'TOTAL TO SELL':<51} AU${total_sell_value:>15,.2f}")
+            lines.append("")
         
         # Print buy actions
         if buy_actions:
-            print("[BUY] ASSETS TO INCREASE")
-            print("-" * 100)
-            print(f"{'Asset':<15} {'Current %':<12} {'Target %':<12} {'Diff %':<12} {'Current Value':<18} {'Buy Value':<18} {'Buy Amount':<18}")
-            print("-" * 100)
+            lines.append("[BUY] ASSETS TO INCREASE")
+            lines.append("-" * 100)
+            lines.append(f"{'Asset':<15} {'Current %':<12} {'Target %':<12} {'Diff %':<12} {'Current Value':<18} {'Buy Value':<18} {'Buy Amount':<18}")
+            lines.append("-" * 100)
             
             total_buy_value = 0.0
             for action in buy_actions:
@@ -272,7 +274,7 @@ class PortfolioRebalancer:
                 
                 current_value_str = f"AU${action.current_value:>15,.2f}" if action.current_value > 0 else "N/A"
                 
-                print(
+                lines.append(
                     f"{action.name:<15} "
                     f"{action.current_allocation:>10.2f}% "
                     f"{action.target_allocation:>10.2f}% "
@@ -282,48 +284,49 @@ class PortfolioRebalancer:
                     f"{buy_amount_str:>18}"
                 )
             
-            print("-" * 100)
-            print(f"{'TOTAL TO BUY':<51} AU${total_buy_value:>15,.2f}")
-            print()
+            lines.append("-" * 100)
+            lines.append(f"{'TOTAL TO BUY':<51} AU${total_buy_value:>15,.2f}")
+            lines.append("")
         
         # Print hold actions if requested
         if show_hold and hold_actions:
-            print("[HOLD] ASSETS WITHIN TARGET RANGE")
-            print("-" * 100)
-            print(f"{'Asset':<15} {'Current %':<12} {'Target %':<12} {'Diff %':<12}")
-            print("-" * 100)
+            lines.append("[HOLD] ASSETS WITHIN TARGET RANGE")
+            lines.append("-" * 100)
+            lines.append(f"{'Asset':<15} {'Current %':<12} {'Target %':<12} {'Diff %':<12}")
+            lines.append("-" * 100)
             
             for action in hold_actions:
-                print(
+                lines.append(
                     f"{action.name:<15} "
                     f"{action.current_allocation:>10.2f}% "
                     f"{action.target_allocation:>10.2f}% "
                     f"{action.allocation_diff:>+10.2f}%"
                 )
-            print()
+            lines.append("")
         
         # Summary
-        print("=" * 100)
-        print("REBALANCING SUMMARY")
-        print("=" * 100)
-        print(f"Assets to Sell: {len(sell_actions)}")
-        print(f"Assets to Buy: {len(buy_actions)}")
-        print(f"Assets to Hold: {len(hold_actions)}")
+        lines.append("=" * 100)
+        lines.append("REBALANCING SUMMARY")
+        lines.append("=" * 100)
+        lines.append(f"Assets to Sell: {len(sell_actions)}")
+        lines.append(f"Assets to Buy: {len(buy_actions)}")
+        lines.append(f"Assets to Hold: {len(hold_actions)}")
         
         if sell_actions:
             total_sell = sum(abs(a.value_diff) for a in sell_actions)
-            print(f"\nTotal Value to Sell: AU${total_sell:,.2f}")
+            lines.append(f"\nTotal Value to Sell: AU${total_sell:,.2f}")
         
         if buy_actions:
             total_buy = sum(a.value_diff for a in buy_actions)
-            print(f"Total Value to Buy: AU${total_buy:,.2f}")
-            print(f"\nNote: You can use proceeds from sales to fund purchases.")
-            print(f"      Net cash needed: AU${max(0, total_buy - (sum(abs(a.value_diff) for a in sell_actions) if sell_actions else 0)):,.2f}")
-        
-        print()
-        print("[!] DISCLAIMER: Rebalancing recommendations are based on target allocations only.")
-        print("   Consider transaction fees, tax implications, and market conditions before executing trades.")
-        print("=" * 100)
+            lines.append(f"Total Value to Buy: AU${total_buy:,.2f}")
+            lines.append(f"\nNote: You can use proceeds from sales to fund purchases.")
+            lines.append(f"      Net cash needed: AU${max(0, total_buy - (sum(abs(a.value_diff) for a in sell_actions) if sell_actions else 0)):,.2f}")
+        
+        lines.append("")
+        lines.append("[!] DISCLAIMER: Rebalancing recommendations are based on target allocations only.")
+        lines.append("   Consider transaction fees, tax implications, and market conditions before executing trades.")
+        lines.append("=" * 100)
+        _flush_lines(lines)
     
     def calculate_deposit_allocation(
         self,
@@ -467,34 +470,37 @@ class PortfolioRebalancer:
         current_total = sum(asset.value for asset in portfolio.values())
         allocations = self.calculate_deposit_allocation(portfolio, deposit_amount, market_data, dca_priorities)
         
+        # Built as a list of lines and written with a single print
+        lines = []
         if not allocations:
-            print("\n" + "=" * 100)
-            print("DEPOSIT ALLOCATION REPORT")
-            print("=" * 100)
-            print("No under-allocated assets found. Portfolio is already balanced or over-allocated.")
-            print("=" * 100)
+            lines.append("\n" + "=" * 100)
+            lines.append("DEPOSIT ALLOCATION REPORT")
+            lines.append("=" * 100)
+            lines.append("No under-allocated assets found. Portfolio is already balanced or over-allocated.")
+            lines.append("=" * 100)
+            _flush_lines(lines)
             return
         
         new_total = current_total + deposit_amount
         
-        print("\n" + "=" * 100)
-        print("DEPOSIT ALLOCATION REPORT")
-        print("=" * 100)
-        print(f"Current Portfolio Value: AU${current_total:,.2f}")
-        print(f"Deposit Amount: AU${deposit_amount:,.2f}")
-        print(f"New Portfolio Value: AU${new_total:,.2f}")
-        print()
-        print("ALLOCATION PLAN")
-        print("-" * 100)
-        print(f"{'Asset':<15} {'Current %':<12} {'Target %':<12} {'Deposit':<18} {'New %':<12} {'Buy Amount':<18}")
-        print("-" * 100)
+        lines.append("\n" + "=" * 100)
+        lines.append("DEPOSIT ALLOCATION REPORT")
+        lines.append("=" * 100)
+        lines.append(f"Current Portfolio Value: AU${current_total:,.2f}")
+        lines.append(f"Deposit Amount: AU${deposit_amount:,.2f}")
+        lines.append(f"New Portfolio Value: AU${new_total:,.2f}")
+        lines.append("")
+        lines.append("ALLOCATION PLAN")
+        lines.append("-" * 100)
+        lines.append(f"{'Asset':<15} {'Current %':<12} {'Target %':<12} {'Deposit':<18} {'New %':<12} {'Buy Amount':<18}")
+        lines.append("-" * 100)
         
         total_allocated = 0.0
         for symbol, details in sorted(allocations.items(), key=lambda x: x[1]["deposit_allocation"], reverse=True):
             total_allocated += details["deposit_allocation"]
             buy_amount_str = f"{details['amount_to_buy']:.8f} {symbol}" if details['price'] > 0 else "N/A"
             
-            print(
+            lines.append(
                 f"{details['name']:<15} "
                 f"{details['current_allocation']:>10.2f}% "
                 f"{details['target_allocation']:>10.2f}% "
@@ -503,18 +509,18 @@ class PortfolioRebalancer:
                 f"{buy_amount_str:>18}"
             )
         
-        print("-" * 100)
-        print(f"{'TOTAL ALLOCATED':<51} AU${total_allocated:>15,.2f}")
+        lines.append("-" * 100)
+        lines.append(f"{'TOTAL ALLOCATED':<51} AU${total_allocated:>15,.2f}")
         if total_allocated < deposit_amount:
             remaining = deposit_amount - total_allocated
-            print(f"{'REMAINING (unallocated)':<51} AU${remaining:>15,.2f}")
-        print()
+            lines.append(f"{'REMAINING (unallocated)':<51} AU${remaining:>15,.2f}")
+        lines.append("")
         
         # Show what allocations will be after deposit
-        print("PROJECTED ALLOCATIONS AFTER DEPOSIT")
-        print("-" * 100)
-        print(f"{'Asset':<15} {'Current %':<12} {'After Deposit %':<18} {'Target %':<12} {'Status':<15}")
-        print("-" * 100)
+        lines.append("PROJECTED ALLOCATIONS AFTER DEPOSIT")
+        lines.append("-" * 100)
+        lines.append(f"{'Asset':<15} {'Current %':<12} {'After Deposit %':<18} {'Target %':<12} {'Status':<15}")
+        lines.append("-" * 100)
         
         # Get all assets (including those not getting deposits)
         all_assets = {}
@@ -556,7 +562,7 @@ class PortfolioRebalancer:
             else:
                 status = "Under Target"
             
-            print(
+            lines.append(
                 f"{details['name']:<15} "
                 f"{details['current']:>10.2f}% "
                 f"{details['after']:>16.2f}% "
@@ -564,12 +570,13 @@ class PortfolioRebalancer:
                 f"{status:>15}"
             )
         
-        print()
-        print("=" * 100)
-        print("NOTE: This allocation strategy avoids selling assets and capital gains taxes.")
-        print("      If deposit is insufficient to reach targets, consider a hybrid approach")
-        print("      (partial deposit + selling over-allocated assets).")
-        print("=" * 100)
+        lines.append("")
+        lines.append("=" * 100)
+        lines.append("NOTE: This allocation strategy avoids selling assets and capital gains taxes.")
+        lines.append("      If deposit is insufficient to reach targets, consider a hybrid approach")
+        lines.append("      (partial deposit + selling over-allocated assets).")
+        lines.append("=" * 100)
+        _flush_lines(lines)
     
     def get_rebalancing_summary(self, actions: List[RebalancingAction]) -> Dict:
         """
@@ -88,6 +88,26 @@ class TechnicalIndicators:
         
         return ema
     
+    @staticmethod
+    def _ema_series(prices: List[float], period: int) -> List[float]:
+        """
+        EMA at every point from index period - 1 onwards
+        
+        Element k is calculate_ema(prices[:period + k], period), computed with
+        the same SMA seed and update order in a single pass.
+        """
+        if len(prices) < period:
+            return []
+        
+        multiplier = 2 / (period + 1)
+        ema = sum(prices[:period]) / period
+        series = [ema]
+        for price in prices[period:]:
+            ema = (price * multiplier) + (ema * (1 - multiplier))
+            series.append(ema)
+        
+        return series
+    
     @staticmethod
     def calculate_macd(
         prices: List[float], 
@@ -164,24 +184,27 @@ class TechnicalIndicators:
         if len(prices) < slow_period + signal_period:
             return None
         
-        # Calculate EMAs for all periods to get MACD history
-        # We need to calculate EMAs progressively to build MACD history
-        macd_values = []
-        
-        # Start from the point where we have enough data for slow EMA
-        start_idx = slow_period - 1
-        
-        for i in range(start_idx, len(prices)):
-            # Get prices up to current point
-            prices_up_to_i = prices[:i+1]
-            
-            # Calculate EMAs
-            fast_ema = TechnicalIndicators.calculate_ema(prices_up_to_i, fast_period)
-            slow_ema = TechnicalIndicators.calculate_ema(prices_up_to_i, slow_period)
-            
-            if fast_ema is not None and slow_ema is not None:
-                macd_value = fast_ema - slow_ema
-                macd_values.append(macd_value)
+        # Each EMA series is built in one pass; its value at i equals
+        # calculate_ema over prices[:i+1], without re-walking the prefix for every i
+        return TechnicalIndicators._macd_from_series(
+            TechnicalIndicators._ema_series(prices, fast_period),
+            TechnicalIndicators._ema_series(prices, slow_period),
+            signal_period
+        )
+    
+    @staticmethod
+    def _macd_from_series(
+        fast_emas: List[float],
+        slow_emas: List[float],
+        signal_period: int
+    ) -> Optional[Dict[str, float]]:
+        """MACD, signal and histogram from the fast and slow _ema_series of one price list"""
+        # MACD history starts where the slow EMA is first defined
+        offset = len(fast_emas) - len(slow_emas)
+        macd_values = [
+            fast_ema - slow_ema
+            for fast_ema, slow_ema in zip(fast_emas[offset:], slow_emas)
+        ]
         
         if len(macd_values) < signal_period:
             return None
@@ -203,6 +226,41 @@ class TechnicalIndicators:
             'histogram': histogram
         }
     
+    @staticmethod
+    def calculate_all(prices: List[float]) -> Dict[str, Optional[object]]:
+        """
+        Every indicator used by the portfolio evaluator from one price list
+        
+        Gives the same values as calling calculate_rsi(14), calculate_sma(50 and
+        200), calculate_ema(12 and 26), calculate_macd_with_history and
+        calculate_bollinger_bands(20) separately, but builds each EMA series
+        once: EMA-12 and EMA-26 are the last points of the series MACD uses,
+        and the Bollinger middle band is the 20-period SMA.
+        
+        Args:
+            prices: List of prices (most recent last)
+            
+        Returns:
+            Dictionary with 'rsi', 'sma_50', 'sma_200', 'ema_12', 'ema_26',
+            'macd' and 'bollinger_bands'; each is None if there is insufficient data
+        """
+        fast_emas = TechnicalIndicators._ema_series(prices, 12)
+        slow_emas = TechnicalIndicators._ema_series(prices, 26)
+        
+        macd = None
+        if len(prices) >= 26 + 9:
+            macd = TechnicalIndicators._macd_from_series(fast_emas, slow_emas, 9)
+        
+        return {
+            'rsi': TechnicalIndicators.calculate_rsi(prices, period=14),
+            'sma_50': TechnicalIndicators.calculate_sma(prices, period=50),
+            'sma_200': TechnicalIndicators.calculate_sma(prices, period=200),
+            'ema_12': fast_emas[-1] if fast_emas else None,
+            'ema_26': slow_emas[-1] if slow_emas else None,
+            'macd': macd,
+            'bollinger_bands': TechnicalIndicators.calculate_bollinger_bands(prices, period=20)
+        }
+    
     @staticmethod
     def calculate_bollinger_bands(
         prices: List[float], 
@@ -0,0 +1,146 @@
+import unittest
+import sys
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+import numpy as np
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from portfolio_database import PortfolioDatabase
+from portfolio_evaluator import Asset, MarketAnalysis, Recommendation
+
+
+def make_asset(symbol, value):
+    return Asset(symbol, symbol.lower(), 1.0, value, 100.0, value)
+
+
+def make_analysis(symbol):
+    return MarketAnalysis(
+        symbol, 1.0, 2.0, 3.0, 4.0, 5.0, 6.0, "bullish",
+        Recommendation.HOLD, "test", "none"
+    )
+
+
+class TestDatabaseOptimization(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db = PortfolioDatabase(os.path.join(self.tmpdir.name, "test.db"))
+
+    def tearDown(self):
+        self.db.close()
+        self.tmpdir.cleanup()
+
+    def count(self, table):
+        return self.db.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def test_same_timestamp_save_keeps_snapshot_id(self):
+        """Re-saving a snapshot upserts in place and replaces its holdings"""
+        timestamp = datetime(2025, 1, 1, 12, 0, 0)
+        first_id = self.db.save_snapshot(
+            {"BTC": make_asset("BTC", 100.0), "ETH": make_asset("ETH", 50.0)},
+            timestamp=timestamp
+        )
+        second_id = self.db.save_snapshot({"BTC": make_asset("BTC", 120.0)}, timestamp=timestamp)
+
+        self.assertEqual(first_id, second_id)
+        latest = self.db.get_latest_snapshot()
+        self.assertEqual(latest.timestamp, timestamp)
+        self.assertEqual(latest.total_value, 120.0)
+        self.assertEqual(list(latest.assets), ["BTC"])
+        self.assertEqual(latest.assets["BTC"]["value"], latest.assets["BTC"].value)
+
+    def test_latest_snapshot_sees_other_connections(self):
+        """The memoized snapshot is a private copy and is refreshed after another connection writes"""
+        self.db.save_snapshot({"BTC": make_asset("BTC", 100.0)}, timestamp=datetime(2025, 1, 1))
+        self.db.get_latest_snapshot().assets.clear()
+        self.assertEqual(list(self.db.get_latest_snapshot().assets), ["BTC"])
+
+        other = PortfolioDatabase(self.db.db_path)
+        try:
+            other.save_snapshot({"BTC": make_asset("BTC", 150.0)}, timestamp=datetime(2025, 1, 2))
+        finally:
+            other.close()
+
+        self.assertEqual(self.db.get_latest_snapshot().total_value, 150.0)
+
+    def test_latest_market_data_comes_from_newest_snapshot(self):
+        """Prices and changes are read back from the latest snapshot only"""
+        self.db.save_snapshot({"BTC": make_asset("BTC", 100.0)}, timestamp=datetime(2025, 1, 1))
+        self.db.save_snapshot(
+            {"BTC": make_asset("BTC", 150.0), "ETH": make_asset("ETH", 50.0)},
+            [make_analysis("BTC")],
+            timestamp=datetime(2025, 1, 2)
+        )
+
+        market_data = self.db.get_latest_market_data()
+
+        self.assertEqual(sorted(market_data), ["BTC", "ETH"])
+        self.assertEqual(market_data["BTC"]["current_price"], 150.0)
+        self.assertEqual(market_data["BTC"]["price_change_7d"], 2.0)
+        self.assertIsNone(market_data["ETH"]["price_change_24h"])
+
+    def test_save_snapshots_bulk(self):
+        """Bulk save writes every snapshot with its holdings and analysis"""
+        start = datetime(2025, 1, 1)
+        entries = [
+            (start + timedelta(days=i), {"BTC": make_asset("BTC", float(i + 1))}, [make_analysis("BTC")])
+            for i in range(50)
+        ]
+
+        snapshot_ids = self.db.save_snapshots_bulk(entries)
+
+        self.assertEqual(len(set(snapshot_ids)), 50)
+        history = self.db.get_portfolio_value_history()
+        self.assertEqual([value for _, value in history], [float(i + 1) for i in range(50)])
+        self.assertEqual(self.count("asset_holdings"), 50)
+        self.assertEqual(self.count("market_analysis"), 50)
+
+    def test_save_historical_prices_bulk(self):
+        """One bulk save stores every symbol's series"""
+        today = datetime.now().date()
+        series = {
+            symbol: [((today - timedelta(days=i)).isoformat(), price + i, None, None) for i in range(3)]
+            for symbol, price in (("BTC", 100.0), ("ETH", 10.0))
+        }
+
+        self.db.save_historical_prices_bulk(series)
+
+        self.assertEqual(self.count("historical_prices"), 6)
+        self.assertEqual([price for _, price in self.db.get_historical_prices("ETH", days=10)], [12.0, 11.0, 10.0])
+
+    def test_historical_prices_arrays_match_tuple_rows(self):
+        """The columnar read parses dates to datetime64[D] and agrees with get_historical_prices"""
+        today = datetime.now().date()
+        self.db.save_historical_prices_bulk({
+            "BTC": [((today - timedelta(days=i)).isoformat(), 100.0 + i, None, None) for i in range(5)]
+        })
+
+        dates, prices = self.db.get_historical_prices_arrays("BTC", days=10)
+
+        self.assertEqual(dates.dtype, np.dtype("datetime64[D]"))
+        self.assertEqual(prices.dtype, np.float64)
+        rows = self.db.get_historical_prices("BTC", days=10)
+        self.assertEqual(dates.tolist(), [day.date() for day, _ in rows])
+        self.assertEqual(prices.tolist(), [price for _, price in rows])
+
+    def test_cleanup_keeps_latest_snapshot_per_day(self):
+        """Old days collapse to their latest snapshot and holdings cascade"""
+        old_day = datetime(2020, 5, 1, 8, 0, 0)
+        for hour in range(3):
+            self.db.save_snapshot(
+                {"BTC": make_asset("BTC", 10.0 + hour)},
+                timestamp=old_day + timedelta(hours=hour)
+            )
+
+        removed = self.db.cleanup_old_snapshots(keep_days=30)
+
+        self.assertEqual(removed, 2)
+        self.assertEqual([value for _, value in self.db.get_portfolio_value_history()], [12.0])
+        self.assertEqual(self.count("asset_holdings"), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
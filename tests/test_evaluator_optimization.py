@@ -0,0 +1,105 @@
+import unittest
+import sys
+import os
+import tempfile
+import time
+from unittest import mock
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+import portfolio_evaluator
+from technical_indicators import TechnicalIndicators
+from portfolio_evaluator import PortfolioEvaluator, Asset, load_portfolio_from_balances
+
+
+def make_portfolio(symbols):
+    return {
+        symbol: Asset(symbol, symbol, 1.0, 100.0, 100.0 / len(symbols), 100.0)
+        for symbol in symbols
+    }
+
+
+class TestEvaluatorOptimization(unittest.TestCase):
+    def setUp(self):
+        self.market_data = {
+            "BTC": {"price_change_24h": 2.5, "price_change_7d": -4.0, "price_change_30d": 12.0},
+            "ETH": {"price_change_24h": -6.1, "price_change_7d": None, "price_change_30d": -15.5},
+            "SOL": {"price_change_24h": 0, "price_change_7d": 0, "price_change_30d": 0},
+        }
+        self.evaluator = PortfolioEvaluator(make_portfolio(["BTC", "ETH", "SOL", "LINK"]))
+
+    def test_vectorized_metrics_match_per_asset_calculation(self):
+        """Batch momentum metrics agree with the scalar per-asset path"""
+        metrics = self.evaluator.calculate_momentum_metrics(self.market_data)
+
+        self.assertEqual(set(metrics), {"BTC", "ETH", "SOL"})
+        for symbol, batch in metrics.items():
+            scalar = self.evaluator._momentum_metrics(
+                *self.evaluator._price_changes(self.market_data[symbol])
+            )
+            for batch_value, scalar_value in zip(batch, scalar):
+                self.assertAlmostEqual(batch_value, scalar_value, places=9)
+        self.assertEqual(metrics["SOL"], (0.0, 0.0, 0.0))
+
+        trends = self.evaluator.classify_trends(metrics)
+        for symbol, batch in metrics.items():
+            self.assertEqual(trends[symbol], self.evaluator._trend(batch[2]))
+
+    def test_portfolio_from_balances(self):
+        """Columnar build prices balances, skips unpriced symbols and sums allocations to 100"""
+        balances = {"BTC": 0.5, "ETH": 2.0, "UNKNOWN": 3.0}
+        market_data = {"BTC": {"current_price": 100000.0}, "ETH": {"current_price": 2500.0}}
+
+        portfolio = load_portfolio_from_balances(balances, market_data)
+
+        self.assertEqual(list(portfolio), ["BTC", "ETH"])
+        self.assertEqual(portfolio["BTC"].value, 50000.0)
+        self.assertAlmostEqual(portfolio["ETH"].allocation_percent, 100.0 * 5000.0 / 55000.0)
+        self.assertEqual(portfolio["ETH"].name, "Ethereum")
+        self.assertAlmostEqual(sum(asset.allocation_percent for asset in portfolio.values()), 100.0)
+
+    def test_market_cache_survives_process_cache_and_expires(self):
+        """Market data written by one run is read back from disk until it is ttl seconds old or caching is off"""
+        key = portfolio_evaluator._market_cache_key(["bitcoin"])
+        data = {"BTC": {"current_price": 100.0, "price_change_7d": None}}
+
+        with tempfile.TemporaryDirectory() as cache_dir, \
+                mock.patch.object(portfolio_evaluator, "MARKET_CACHE_DIR", cache_dir), \
+                mock.patch.dict(portfolio_evaluator._MARKET_CACHE, clear=True):
+            portfolio_evaluator._cache_put(key, data)
+            portfolio_evaluator._MARKET_CACHE.clear()
+
+            self.assertEqual(portfolio_evaluator._cache_get(key, ttl=60), data)
+
+            # Callers get their own nested dicts
+            portfolio_evaluator._cache_get(key, ttl=60)["BTC"]["current_price"] = 0.0
+            self.assertEqual(portfolio_evaluator._cache_get(key, ttl=60), data)
+
+            portfolio_evaluator._MARKET_CACHE.clear()
+            with mock.patch.object(portfolio_evaluator.time, "time", return_value=time.time() + 120):
+                self.assertIsNone(portfolio_evaluator._cache_get(key, ttl=60))
+
+            # --no-cache bypasses both cache layers
+            portfolio_evaluator._cache_put(key, data)
+            with mock.patch.object(portfolio_evaluator, "MARKET_CACHE_ENABLED", False):
+                self.assertIsNone(portfolio_evaluator._cache_get(key, ttl=60))
+
+    def test_macd_history_matches_prefix_emas(self):
+        """The single-pass MACD history equals EMAs recomputed over every price prefix"""
+        prices = list(np.random.default_rng(11).uniform(50, 150, 120))
+
+        macd = TechnicalIndicators.calculate_macd_with_history(prices)
+
+        macd_values = [
+            TechnicalIndicators.calculate_ema(prices[:i + 1], 12) - TechnicalIndicators.calculate_ema(prices[:i + 1], 26)
+            for i in range(25, len(prices))
+        ]
+        self.assertEqual(macd["macd"], macd_values[-1])
+        self.assertEqual(macd["signal"], TechnicalIndicators.calculate_ema(macd_values, 9))
+
+
+if __name__ == '__main__':
+    unittest.main()
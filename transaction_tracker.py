@@ -10,6 +10,8 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
 
+from json_utils import response_json
+
 from transaction_models import (
     Transaction, TransactionType, CostBasisLot, RealizedPnL, 
     UnrealizedPnL, AccountingMethod
@@ -17,7 +19,7 @@ from transaction_models import (
 
 # Try to import constants, fallback if not available
 from constants import (
-    COINGECKO_BASE_URL, COIN_IDS, DEFAULT_CURRENCY,
+    COINGECKO_BASE_URL, COIN_IDS, COIN_ID_TO_SYMBOL, DEFAULT_CURRENCY,
     API_RETRY_COUNT, API_TIMEOUT, API_RATE_LIMIT_BACKOFF_BASE
 )
 
@@ -615,8 +617,7 @@ class TransactionTracker:
         Returns:
             Dictionary mapping symbol to current price
         """
-        coin_ids = [COIN_IDS.get(symbol.upper()) for symbol in symbols 
-                   if symbol.upper() in COIN_IDS]
+        coin_ids = [coin_id for coin_id in map(COIN_IDS.get, map(str.upper, symbols)) if coin_id]
         
         if not coin_ids:
             return {}
@@ -657,10 +658,10 @@ class TransactionTracker:
                         return {}
                 
                 response.raise_for_status()
-                data = response.json()
+                data = response_json(response)
                 break  # Success, exit retry loop
                 
-            except requests.exceptions.RequestException as e:
+            except (requests.exceptions.RequestException, ValueError) as e:
                 if attempt < retry_count - 1:
                     wait_time = (attempt + 1) * API_RATE_LIMIT_BACKOFF_BASE
                     print(f"    Request error: {e}. Retrying in {wait_time} seconds...")
@@ -675,8 +676,7 @@ class TransactionTracker:
         # Organize data by symbol
         prices = {}
         for coin in data:
-            symbol = next((s for s, cid in COIN_IDS.items() 
-                          if cid == coin["id"]), None)
+            symbol = COIN_ID_TO_SYMBOL.get(coin["id"])
             if symbol:
                 prices[symbol] = coin["current_price"]
         